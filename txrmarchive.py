@@ -0,0 +1,312 @@
+######################################################################################
+#  ______________   ___      ___   ______      ____        ____    __     _______    #
+# |_____    _____|  \  \    /  /  |  | \  \   |    \      /    |  |  |  /   ___   \  #
+#       |  |         \  \  /  /   |  |  |  |  |     \    /     |  |  |  |  |   |  |  #
+#       |  |          \  `´  /    |  | /  /   |  |\  \  /  /|  |  |  |  |  |   |  |  #
+#       |  |          /  /\  \    |  |\  \    |  | \  \/  / |  |  |  |  |  |   |  |  #
+#  _    |  |         /  /  \  \   |  | \  \   |  |  \ __ /  |  |  |  |  |  |___|  |  #
+# |_|   |__|        /__/    \__\  |__|  \__\  |__|          |__|  |__|  \ _______ /  #
+#                                                                                    #
+######################################################################################
+# This software was created by Mario Krake for ISEA at RWTH.                         #
+#                                                                                    #
+# Use at your own risk. Mario Krake and RWTH are not responsible for any kind of     #
+# damage including hardware and software, data loss, profit loss, or any other kind. #
+# By using the software you agree to the terms and conditions.                       #
+#                                                                                    #
+# Monetized and/or uncredited distribution is strongly prohibited.                   #
+######################################################################################
+
+import os
+import json
+import zlib
+import lzma
+import hashlib
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import txrmio2
+
+# Optional faster codecs
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+
+MAGIC = b"TXRMARC\x01"
+# Size of the blocks of the remaining (non image) file content
+BLOCK_SIZE = 4*1024*1024
+
+
+def _codec(name, level=None):
+    """Returns (compress, decompress) of a codec"""
+    if name == "zlib":
+        return (lambda data: zlib.compress(data, 6 if level is None else level)), zlib.decompress
+    if name == "lzma":
+        return (lambda data: lzma.compress(data, preset=6 if level is None else level)), lzma.decompress
+    if name == "zstd":
+        if zstandard is None:
+            raise ImportError("The zstd codec needs the zstandard package")
+        # A (de)compressor must not be used by several threads at once, every thread gets its own
+        local = threading.local()
+        def compress(data):
+            if not hasattr(local, "compressor"):
+                local.compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+            return local.compressor.compress(data)
+        def decompress(data):
+            if not hasattr(local, "decompressor"):
+                local.decompressor = zstandard.ZstdDecompressor()
+            return local.decompressor.decompress(data)
+        return compress, decompress
+    if name == "lz4":
+        if lz4 is None:
+            raise ImportError("The lz4 codec needs the lz4 package")
+        return ((lambda data: lz4.frame.compress(data, compression_level=0 if level is None else level)),
+                lz4.frame.decompress)
+    raise ValueError(f"Unknown codec {name}")
+
+def _default_codec():
+    return "zstd" if zstandard is not None else ("lz4" if lz4 is not None else "zlib")
+
+def filter_frame(data, shape, itemsize):
+    """
+    Lossless filter of a frame before compression: Difference to the left neighbour
+    (integer wrap around, so also exact for float32) and byte shuffling
+    """
+    frame = np.frombuffer(data, dtype=f"<u{itemsize}").reshape(shape)
+    delta = np.empty_like(frame)
+    delta[:, 0] = frame[:, 0]
+    np.subtract(frame[:, 1:], frame[:, :-1], out=delta[:, 1:])
+    return delta.view(np.uint8).reshape(-1, itemsize).T.tobytes()
+
+def unfilter_frame(data, shape, itemsize):
+    """Reverts filter_frame and returns the original bytes"""
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(itemsize, -1)
+    delta = np.ascontiguousarray(planes.T).view(f"<u{itemsize}").reshape(shape)
+    return np.cumsum(delta, axis=1, dtype=delta.dtype).tobytes()
+
+
+###################################################################################################
+
+def archive(txrm_path, archive_path=None, codec=None, level=None, workers=None):
+    """
+    Compresses a .txrm file into an archive (.txrma). The images are compressed frame by frame in parallel
+    (filter_frame + codec), the rest of the file is stored in compressed blocks with the image data zeroed.
+    Every image stays randomly accessible and restore gives back the original file bit by bit.
+    Returns the path of the archive
+    """
+    archive_path = f"{os.path.splitext(txrm_path)[0]}.txrma" if archive_path is None else archive_path
+    codec = _default_codec() if codec is None else codec
+    compress, _ = _codec(codec, level)
+    workers = os.cpu_count() if workers is None else workers
+
+    with txrmio2.CFB_File(txrm_path) as cfb:
+        width = int.from_bytes(cfb.read("ImageInfo/ImageWidth"), "little")
+        height = int.from_bytes(cfb.read("ImageInfo/ImageHeight"), "little")
+        itemsize = 4 if int.from_bytes(cfb.read("ImageInfo/DataType"), "little") == 10 else 2
+        shape = (height, width)
+        frame_size = height*width*itemsize
+        images = [p for p in cfb.streams() if p.split("/")[0].startswith("ImageData")
+                  and p.split("/")[-1].startswith("Image") and cfb.size(p) == frame_size]
+        images.sort(key=lambda p: int(p.split("/")[-1][5:]))
+        image_runs = {path: cfb.runs(path) for path in images}
+        # Non image content, image sectors are zeroed to compress to nothing
+        starts, ends = np.array(sorted((o, o+n) for runs in image_runs.values() for o, n in runs),
+                                dtype=np.int64).reshape(-1, 2).T
+        def residual_block(start):
+            block = bytearray(cfb.data[start:start+BLOCK_SIZE])
+            first = np.searchsorted(ends, start, side="right")
+            last = np.searchsorted(starts, start+len(block), side="left")
+            for run_start, run_end in zip(starts[first:last], ends[first:last]):
+                low, high = max(run_start, start)-start, min(run_end, start+len(block))-start
+                block[low:high] = bytes(high-low)
+            return bytes(block)
+        index = {
+            "codec": codec,
+            "filter": "delta_shuffle",
+            "shape": shape,
+            "itemsize": itemsize,
+            "file_size": len(cfb.data),
+            "sha256": hashlib.sha256(cfb.data).hexdigest(),
+            "images": [],
+            "blocks": [],
+            "streams": dict(),
+        }
+        with open(archive_path, "wb") as f, ThreadPoolExecutor(max_workers=workers) as pool:
+            f.write(MAGIC)
+            def write_ordered(jobs, target):
+                # Bounded number of frames in flight, written in order
+                pending = deque()
+                for key, job in jobs:
+                    pending.append((key, pool.submit(*job)))
+                    if len(pending) >= 2*workers:
+                        _write(f, target, *pending.popleft())
+                while pending:
+                    _write(f, target, *pending.popleft())
+
+            write_ordered(((path, (lambda d: compress(filter_frame(d, shape, itemsize)), cfb.read(path)))
+                           for path in images), index["images"])
+            for item, path in zip(index["images"], images):
+                item["runs"] = image_runs[path]
+            write_ordered(((i, (lambda start: compress(residual_block(start)), i))
+                           for i in range(0, len(cfb.data), BLOCK_SIZE)), index["blocks"])
+            # Small copies of the meta data streams for fast access without restoring
+            for entry in txrmio2.META_SCHEMA.values():
+                path = entry["paths"][0]
+                if cfb.exists(path):
+                    index["streams"][path] = cfb.read(path).hex()
+            raw_index = json.dumps(index).encode()
+            f.write(raw_index)
+            f.write(len(raw_index).to_bytes(8, "little"))
+            f.write(MAGIC)
+    return archive_path
+
+def _write(f, target, key, future):
+    data = future.result()
+    target.append({"key": key, "offset": f.tell(), "size": len(data)})
+    f.write(data)
+
+
+class TXRM_Archive:
+    """
+    Readonly random access to the images of an archive, works like TXRM_array
+    """
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        self.file = open(archive_path, "rb")
+        self.file.seek(-16, os.SEEK_END)
+        length = int.from_bytes(self.file.read(8), "little")
+        if self.file.read(8) != MAGIC:
+            raise IOError(f"{archive_path} is not a txrm archive")
+        self.file.seek(-16-length, os.SEEK_END)
+        self.index = json.loads(self.file.read(length))
+        _, self.__decompress = _codec(self.index["codec"])
+        self.img_shape = tuple(self.index["shape"])
+        self.itemsize = self.index["itemsize"]
+        self.img_dtype = np.float32 if self.itemsize == 4 else np.uint16
+        self.num_of_images = len(self.index["images"])
+        self.__paths = {item["key"].lower(): i for i, item in enumerate(self.index["images"])}
+
+    def __enter__(self):  # Neccessary for contextmanager
+        return self
+
+    def __exit__(self, type, value, traceback):  # Neccessary for contextmanager
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def __chunk(self, item):
+        self.file.seek(item["offset"])
+        return self.file.read(item["size"])
+
+    def read_frame(self, i):
+        """Returns the original bytes of image i (0-based)"""
+        data = self.__decompress(self.__chunk(self.index["images"][i]))
+        return unfilter_frame(data, self.img_shape, self.itemsize)
+
+    def read_stream(self, stream):
+        """Returns the bytes of an image or a meta data stream, b'' if not in the archive"""
+        if stream.lower() in self.__paths:
+            return self.read_frame(self.__paths[stream.lower()])
+        for path, data in self.index["streams"].items():
+            if path.lower() == stream.lower():
+                return bytes.fromhex(data)
+        return b""
+
+    def __getitem__(self, val):
+        other = []
+        if type(val)==tuple and isinstance(val[0], (int, tuple, slice, list, np.ndarray)):
+            val, *other = val
+        idx = np.arange(self.num_of_images)[val]
+        if np.ndim(idx) == 0:
+            return np.frombuffer(self.read_frame(int(idx)), dtype=self.img_dtype).reshape(self.img_shape)[tuple(other)]
+        out = np.empty((idx.size, *self.img_shape), dtype=self.img_dtype)
+        for i, j in enumerate(idx):
+            out[i] = np.frombuffer(self.read_frame(int(j)), dtype=self.img_dtype).reshape(self.img_shape)
+        return out[(slice(None), *other)]
+
+    def __len__(self):
+        return self.num_of_images
+
+    @property
+    def shape(self):
+        return (self.num_of_images, *self.img_shape)
+
+    @property
+    def angles(self):
+        angles = np.frombuffer(self.read_stream("ImageInfo/Angles"), np.float32)
+        return np.deg2rad(angles) if txrmio2.ANGLE_UNIT=="rad" else angles
+
+    def restore(self, txrm_path, workers=None, verify=True):
+        """
+        Writes the original .txrm file, decompression runs in parallel.
+        With verify the sha256 of the result is checked
+        """
+        workers = os.cpu_count() if workers is None else workers
+        digest = hashlib.sha256()
+        with open(txrm_path, "wb") as f, ThreadPoolExecutor(max_workers=workers) as pool:
+            f.truncate(self.index["file_size"])
+
+            def restore_ordered(jobs, write):
+                # Bounded number of chunks in flight, written in order
+                pending = deque()
+                for item, job in jobs:
+                    pending.append((item, pool.submit(*job)))
+                    if len(pending) >= 2*workers:
+                        write(*pending.popleft())
+                while pending:
+                    write(*pending.popleft())
+
+            def write_frame(item, future):
+                data, position = future.result(), 0
+                for offset, length in item["runs"]:
+                    f.seek(offset)
+                    f.write(data[position:position+length])
+                    position += length
+
+            restore_ordered(((item, (self.__decompress, self.__chunk(item))) for item in self.index["blocks"]),
+                            lambda item, future: f.write(future.result()))
+            restore_ordered(((item, (lambda data: unfilter_frame(self.__decompress(data), self.img_shape,
+                                                                 self.itemsize), self.__chunk(item)))
+                             for item in self.index["images"]), write_frame)
+        if verify:
+            with open(txrm_path, "rb") as f:
+                for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+                    digest.update(block)
+            if digest.hexdigest() != self.index["sha256"]:
+                raise IOError(f"Restored file {txrm_path} differs from the archived one")
+        return txrm_path
+
+
+def restore(archive_path, txrm_path=None, workers=None, verify=True):
+    """Restores the original .txrm file of an archive, see TXRM_Archive.restore"""
+    txrm_path = f"{os.path.splitext(archive_path)[0]}.txrm" if txrm_path is None else txrm_path
+    with TXRM_Archive(archive_path) as arc:
+        return arc.restore(txrm_path, workers, verify)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lossless archives of .txrm files")
+    parser.add_argument("command", choices=["archive", "restore"])
+    parser.add_argument("source")
+    parser.add_argument("target", nargs="?", default=None)
+    parser.add_argument("--codec", default=None, choices=["zlib", "lzma", "zstd", "lz4"])
+    parser.add_argument("--level", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    if args.command == "archive":
+        print(archive(args.source, args.target, args.codec, args.level, args.workers))
+    else:
+        print(restore(args.source, args.target, args.workers))
+
+if __name__ == "__main__":
+    main()
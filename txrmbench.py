@@ -0,0 +1,335 @@
+######################################################################################
+#  ______________   ___      ___   ______      ____        ____    __     _______    #
+# |_____    _____|  \  \    /  /  |  | \  \   |    \      /    |  |  |  /   ___   \  #
+#       |  |         \  \  /  /   |  |  |  |  |     \    /     |  |  |  |  |   |  |  #
+#       |  |          \  `´  /    |  | /  /   |  |\  \  /  /|  |  |  |  |  |   |  |  #
+#       |  |          /  /\  \    |  |\  \    |  | \  \/  / |  |  |  |  |  |   |  |  #
+#  _    |  |         /  /  \  \   |  | \  \   |  |  \ __ /  |  |  |  |  |  |___|  |  #
+# |_|   |__|        /__/    \__\  |__|  \__\  |__|          |__|  |__|  \ _______ /  #
+#                                                                                    #
+######################################################################################
+# This software was created by Mario Krake for ISEA at RWTH.                         #
+#                                                                                    #
+# Use at your own risk. Mario Krake and RWTH are not responsible for any kind of     #
+# damage including hardware and software, data loss, profit loss, or any other kind. #
+# By using the software you agree to the terms and conditions.                       #
+#                                                                                    #
+# Monetized and/or uncredited distribution is strongly prohibited.                   #
+######################################################################################
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy import float32
+
+import txrmio2
+
+
+###################################################################################################
+# Synthetic files
+
+def make_synthetic(file_path, num_of_images=100, height=256, width=256, dtype="uint16", seed=0):
+    """
+    Writes a synthetic .txrm file with the image layout of Zeiss (100 images per ImageData{k} storage)
+    and the meta data TXRM_IO needs. Returns the number of bytes of image data
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in (np.dtype("uint16"), np.dtype("float32")):
+        raise ValueError("dtype has to be uint16 or float32")
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    rng = np.random.default_rng(seed)
+    n = num_of_images
+    with txrmio2.OLE_Base(file_path, "w") as ole:
+        scalars = {
+            "image_width": width,
+            "image_height": height,
+            "image_data_type": 5 if dtype == np.uint16 else 10,
+            "number_of_images": n,
+            "pixel_size": 1.0,
+            "cam_pixel_size": 13.5,
+            "optical_magnification": 4.0,
+            "binning": 1,
+            "reference_filename": b"synthetic_reference.xrm",
+            "reference_data_type": 10,
+        }
+        arrays = {
+            "angles": np.linspace(-180, 180, n, endpoint=False),
+            "x_positions": rng.normal(0, 5, n),
+            "y_positions": rng.normal(0, 5, n),
+            "z_positions": np.zeros(n),
+            "x_shifts": rng.normal(0, 1, n),
+            "y_shifts": rng.normal(0, 1, n),
+            "detector_distance": np.full(n, 50.0),
+            "source_distance": np.full(n, -25.0),
+        }
+        for name, value in {**scalars, **arrays}.items():
+            entry = txrmio2.META_SCHEMA[name]
+            for path in entry["paths"]:
+                ole.write_stream(path, txrmio2.encode_meta(value, entry))
+        ole.write_stream("ImageInfo/ExpTimes", rng.uniform(1, 2, n).astype(float32).tobytes())
+        dates = np.datetime64("2021-07-05T14:00:00.000") + np.arange(n)*np.timedelta64(1500, "ms")
+        ole.write_stream("ImageInfo/Dates", txrmio2.encode_dates(dates))
+        axes = np.array([b"Sample X", b"Sample Y", b"Sample Z", b"Sample Theta"])
+        ole.write_stream("PositionInfo/AxisNames", txrmio2.encode_names(axes))
+        ole.write_stream("PositionInfo/AxisUnits", txrmio2.encode_names([b"um", b"um", b"um", b"deg"]))
+        ole.write_stream("PositionInfo/MotorPositions", rng.normal(0, 1, (n, axes.size)).astype(float32).tobytes())
+        ole.write_stream("ReferenceData/Image", rng.uniform(0.9, 1.1, (height, width)).astype(float32).tobytes())
+
+        base = rng.integers(1000, 20000, (height, width)).astype(dtype)
+        for i in range(1, n+1):
+            noise = rng.integers(0, 64, (height, width)).astype(dtype)
+            ole.write_stream(f"ImageData{(i+99)//100}/Image{i}", (base + noise).tobytes())
+    return n*height*width*dtype.itemsize
+
+
+###################################################################################################
+# Cases, every case gets (file_path, work_dir, config) and returns the number of moved bytes
+
+def _image_bytes(config):
+    return config["height"]*config["width"]*np.dtype(config["dtype"]).itemsize
+
+def case_open(file_path, work_dir, config):
+    with txrmio2.OLE_Base(file_path, "r") as ole:
+        ole.streams
+    return 0
+
+def case_open_meta(file_path, work_dir, config):
+    txrmio2.read_meta(file_path)
+    return 0
+
+def case_load(file_path, work_dir, config):
+    with txrmio2.TXRM_IO(file_path, "r") as txrm:
+        return txrm.images.nbytes
+
+def case_read_random(file_path, work_dir, config):
+    rng = np.random.default_rng(1)
+    with txrmio2.TXRM_array(file_path) as arr:
+        idx = rng.choice(len(arr), size=min(config["reads"], len(arr)), replace=False)
+        for i in idx:
+            arr[int(i)]
+    return idx.size*_image_bytes(config)
+
+def case_read_strided(file_path, work_dir, config):
+    with txrmio2.TXRM_array(file_path) as arr:
+        out = arr[::config["stride"]]
+    return out.nbytes
+
+def case_read_roi(file_path, work_dir, config):
+    h, w = config["height"], config["width"]
+    with txrmio2.TXRM_array(file_path) as arr:
+        out = arr[:, h//4:3*h//4, w//4:3*w//4]
+    return len(out)*_image_bytes(config)
+
+def case_normalize(file_path, work_dir, config):
+    with txrmio2.TXRM_IO(file_path, "r") as txrm:
+        txrm.normalize_images()
+        return txrm.images.nbytes
+
+def _copy(file_path, work_dir, name):
+    target = os.path.join(work_dir, name)
+    shutil.copy(file_path, target)
+    return target
+
+def _edit(txrm, indices=None):
+    """Changes one pixel of the images indices (default all), unchanged images are not written by save"""
+    images = txrm.images.copy()
+    images[slice(None) if indices is None else indices, 0, 0] += 1
+    txrm.images = images
+
+def _timed_save(txrm, save, config):
+    """Times save() (just the save itself) and returns the bytes it wrote to streams"""
+    stats = txrmio2.enable_profiling()
+    start = time.perf_counter()
+    try:
+        save()
+    finally:
+        config["_elapsed"] = time.perf_counter() - start
+        txrmio2.disable_profiling()
+    return stats.nbytes["image_write"] + stats.nbytes["write_stream"]
+
+def case_save(file_path, work_dir, config):
+    """Every image is edited, so all of them are rewritten"""
+    with txrmio2.TXRM_IO(_copy(file_path, work_dir, "save.txrm"), "w", overwrite=True) as txrm:
+        _edit(txrm)
+        return _timed_save(txrm, txrm.save, config)
+
+def case_save_one(file_path, work_dir, config):
+    """Just one image is edited, the others stay in place"""
+    with txrmio2.TXRM_IO(_copy(file_path, work_dir, "save_one.txrm"), "w", overwrite=True) as txrm:
+        _edit(txrm, [len(txrm.images)//2])
+        return _timed_save(txrm, txrm.save, config)
+
+def case_save_as(file_path, work_dir, config):
+    """The file is copied and every (edited) image is rewritten in the copy"""
+    target = os.path.join(work_dir, "save_as_copy.txrm")
+    with txrmio2.TXRM_IO(_copy(file_path, work_dir, "save_as.txrm"), "w", overwrite=True) as txrm:
+        _edit(txrm)
+        written = _timed_save(txrm, lambda: txrm.save_as(target), config)
+    return written + os.path.getsize(target)
+
+def case_compact(file_path, work_dir, config):
+    target = _copy(file_path, work_dir, "compact.txrm")
+    start = time.perf_counter()
+    with txrmio2.OLE_Base(target, "w") as ole:
+        ole.compact()
+    config["_elapsed"] = time.perf_counter() - start
+    return os.path.getsize(target)
+
+# Cases that write files, they need pywin32
+WRITE_CASES = ["save", "save_one", "save_as", "compact"]
+
+CASES = {
+    "open": case_open,
+    "open_meta": case_open_meta,
+    "load": case_load,
+    "read_random": case_read_random,
+    "read_strided": case_read_strided,
+    "read_roi": case_read_roi,
+    "normalize": case_normalize,
+    "save": case_save,
+    "save_one": case_save_one,
+    "save_as": case_save_as,
+    "compact": case_compact,
+}
+
+
+###################################################################################################
+# Runner
+
+def _peak_rss():
+    """Returns the peak resident memory of this process in bytes, None if unknown"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak*1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss)
+    except ImportError:
+        return None
+
+def _can_write():
+    """Returns if files can be written (pywin32 is installed and BACKEND is not "native")"""
+    try:
+        txrmio2._native(write=True)
+        return True
+    except (ImportError, IOError):
+        return False
+
+def _run_case(name, file_path, config):
+    """Runs one case in a fresh process so the peak memory belongs to this case only"""
+    with tempfile.TemporaryDirectory(dir=config.get("work_dir")) as work_dir:
+        start = time.perf_counter()
+        moved = CASES[name](file_path, work_dir, config)
+        elapsed = config.pop("_elapsed", time.perf_counter() - start)
+    return {"seconds": elapsed, "bytes": int(moved), "peak_rss": _peak_rss()}
+
+def run(config, cases=None):
+    """
+    Generates the synthetic file of config (or uses config["file"]) and runs the cases (default all)
+    repeat times each. Without pywin32 just the reading cases of an existing file can run.
+    Returns the report as dict, the best (fastest) run of every case is kept
+    """
+    cases = list(CASES) if cases is None else cases
+    if not _can_write():
+        if config.get("file") is None:
+            raise ImportError("Generating the synthetic file needs pywin32, pass an existing file (--file)")
+        skipped = [name for name in cases if name in WRITE_CASES]
+        if skipped:
+            print("pywin32 is missing, skipping", ", ".join(skipped))
+        cases = [name for name in cases if name not in WRITE_CASES]
+    work_dir = tempfile.mkdtemp(dir=config.get("work_dir"))
+    try:
+        results = dict()
+        if config.get("file") is None:
+            file_path = os.path.join(work_dir, "synthetic.txrm")
+            start = time.perf_counter()
+            make_synthetic(file_path, config["images"], config["height"], config["width"], config["dtype"])
+            results["generate"] = {"seconds": time.perf_counter()-start, "bytes": os.path.getsize(file_path),
+                                   "peak_rss": None}
+        else:
+            file_path = config["file"]
+            meta = txrmio2.read_meta(file_path)
+            config.update(images=int(meta["number_of_images"]), height=int(meta["image_height"]),
+                          width=int(meta["image_width"]),
+                          dtype="float32" if meta["image_data_type"] == 10 else "uint16")
+        for name in cases:
+            runs = []
+            for _ in range(config["repeat"]):
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    runs.append(pool.submit(_run_case, name, file_path, dict(config)).result())
+            best = min(runs, key=lambda r: r["seconds"])
+            best["peak_rss"] = max((r["peak_rss"] or 0) for r in runs) or None
+            results[name] = best
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    for result in results.values():
+        result["mb_per_s"] = result["bytes"]/result["seconds"]/1e6 if result["seconds"] > 0 else None
+        result["peak_rss_mb"] = result.pop("peak_rss")/1e6 if result["peak_rss"] else None
+    return {
+        "txrmio_version": txrmio2.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": config,
+        "results": results,
+    }
+
+def compare(old, new):
+    """Returns a text table with the timings of two reports, ratio > 1 means new is faster"""
+    lines = [f"{'case':<14}{'old [s]':>12}{'new [s]':>12}{'ratio':>8}{'new MB/s':>12}"]
+    for name, result in new["results"].items():
+        if name not in old["results"]:
+            continue
+        before, after = old["results"][name]["seconds"], result["seconds"]
+        ratio = before/after if after else float("nan")
+        mb_per_s = f"{result['mb_per_s']:.1f}" if result["mb_per_s"] else "-"
+        lines.append(f"{name:<14}{before:>12.4f}{after:>12.4f}{ratio:>8.2f}{mb_per_s:>12}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of txrmio2 with synthetic files. Generating the "
+                                                 "file and the save cases need pywin32")
+    parser.add_argument("--images", type=int, default=200, help="Number of projections")
+    parser.add_argument("--height", type=int, default=512)
+    parser.add_argument("--width", type=int, default=512)
+    parser.add_argument("--dtype", default="uint16", choices=["uint16", "float32"])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case, the fastest is reported")
+    parser.add_argument("--reads", type=int, default=50, help="Number of random reads")
+    parser.add_argument("--stride", type=int, default=10, help="Stride of the strided read")
+    parser.add_argument("--cases", nargs="*", choices=list(CASES), help="Cases to run, default all")
+    parser.add_argument("--file", default=None,
+                        help="Benchmark this file instead of a synthetic one (the size options are ignored)")
+    parser.add_argument("--work-dir", default=None, help="Directory for the temporary files")
+    parser.add_argument("--out", default=None, help="Write the json report to this file")
+    parser.add_argument("--compare", default=None, help="Json report of an older run to compare with")
+    args = parser.parse_args(argv)
+
+    config = {"images": args.images, "height": args.height, "width": args.width, "dtype": args.dtype,
+              "repeat": args.repeat, "reads": args.reads, "stride": args.stride, "work_dir": args.work_dir,
+              "file": args.file}
+    report = run(config, args.cases)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(json.load(f), report))
+    else:
+        print(json.dumps(report["results"], indent=2))
+    return report
+
+if __name__ == "__main__":
+    main()
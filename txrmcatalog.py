@@ -0,0 +1,194 @@
+######################################################################################
+#  ______________   ___      ___   ______      ____        ____    __     _______    #
+# |_____    _____|  \  \    /  /  |  | \  \   |    \      /    |  |  |  /   ___   \  #
+#       |  |         \  \  /  /   |  |  |  |  |     \    /     |  |  |  |  |   |  |  #
+#       |  |          \  `´  /    |  | /  /   |  |\  \  /  /|  |  |  |  |  |   |  |  #
+#       |  |          /  /\  \    |  |\  \    |  | \  \/  / |  |  |  |  |  |   |  |  #
+#  _    |  |         /  /  \  \   |  | \  \   |  |  \ __ /  |  |  |  |  |  |___|  |  #
+# |_|   |__|        /__/    \__\  |__|  \__\  |__|          |__|  |__|  \ _______ /  #
+#                                                                                    #
+######################################################################################
+# This software was created by Mario Krake for ISEA at RWTH.                         #
+#                                                                                    #
+# Use at your own risk. Mario Krake and RWTH are not responsible for any kind of     #
+# damage including hardware and software, data loss, profit loss, or any other kind. #
+# By using the software you agree to the terms and conditions.                       #
+#                                                                                    #
+# Monetized and/or uncredited distribution is strongly prohibited.                   #
+######################################################################################
+
+import os
+import json
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import txrmio2
+
+
+# Columns of the index, the complete meta data is also stored as json
+COLUMNS = {
+    "path": "TEXT PRIMARY KEY",
+    "mtime": "REAL",
+    "file_size": "INTEGER",
+    "image_width": "INTEGER",
+    "image_height": "INTEGER",
+    "image_data_type": "INTEGER",
+    "number_of_images": "INTEGER",
+    "pixel_size": "REAL",
+    "cam_pixel_size": "REAL",
+    "optical_magnification": "REAL",
+    "binning": "INTEGER",
+    "angle_min": "REAL",
+    "angle_max": "REAL",
+    "date_start": "TEXT",
+    "date_end": "TEXT",
+    "meta": "TEXT",
+}
+# Keyword arguments of query which are compared against a range of columns
+RANGE_QUERIES = {
+    "angle": ("angle_min", "angle_max"),
+    "date": ("date_start", "date_end"),
+}
+
+
+def _to_json(value):
+    """Converts the numpy values of the meta data to something json can store"""
+    if isinstance(value, bytes):
+        return value.decode("latin-1").rstrip("\x00")
+    value = np.asarray(value)
+    if value.dtype.kind == "M":
+        return np.datetime_as_string(value).tolist()
+    if value.dtype.kind == "S":
+        return [v.decode("latin-1") for v in value.tolist()]
+    return value.tolist()
+
+def _scalar(value):
+    value = np.asarray(value)
+    return value.item() if value.size == 1 else None
+
+def extract(file_path):
+    """
+    Reads the meta data of one file and returns the row for the index.
+    Runs in the worker processes
+    """
+    stat = os.stat(file_path)
+    meta = txrmio2.read_meta(file_path)
+    angles = np.asarray(meta["angles"], dtype=np.float64)
+    dates = np.asarray(meta["dates"])
+    row = {
+        "path": os.path.abspath(file_path),
+        "mtime": stat.st_mtime,
+        "file_size": stat.st_size,
+        "angle_min": float(angles.min()) if angles.size else None,
+        "angle_max": float(angles.max()) if angles.size else None,
+        "date_start": str(dates.min()) if dates.dtype.kind == "M" and dates.size else None,
+        "date_end": str(dates.max()) if dates.dtype.kind == "M" and dates.size else None,
+        "meta": json.dumps({key: _to_json(value) for key, value in meta.items()}),
+    }
+    for key in ["image_width", "image_height", "image_data_type", "number_of_images", "pixel_size",
+                "cam_pixel_size", "optical_magnification", "binning"]:
+        row[key] = _scalar(meta[key])
+    return row
+
+def find_files(paths, suffix=".txrm"):
+    """Returns all files with the suffix in the given files and directories (recursive)"""
+    if isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        if os.path.isfile(path):
+            yield os.path.abspath(path)
+            continue
+        for root, _, files in os.walk(path):
+            for name in files:
+                if name.lower().endswith(suffix):
+                    yield os.path.abspath(os.path.join(root, name))
+
+
+class TXRM_Catalog:
+    """
+    Queryable SQLite index of the meta data of many files.
+    Files are just read again if their modification time changed
+    """
+    def __init__(self, db_path="txrm_catalog.sqlite"):
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path)
+        self.db.row_factory = sqlite3.Row
+        columns = ", ".join(f'"{name}" {typ}' for name, typ in COLUMNS.items())
+        self.db.execute(f"CREATE TABLE IF NOT EXISTS scans ({columns})")
+        self.db.commit()
+
+    def __enter__(self):  # Neccessary for contextmanager
+        return self
+
+    def __exit__(self, type, value, traceback):  # Neccessary for contextmanager
+        self.close()
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def update(self, paths, workers=None, prune=False):
+        """
+        Adds new and changed files of the given files/directories to the index.
+        The files are read in parallel by workers processes (default: number of cpus).
+        With prune rows of files which do not exist anymore are removed.
+        Returns (number of updated files, list of (path, error) for failed files)
+        """
+        known = dict(self.db.execute("SELECT path, mtime FROM scans").fetchall())
+        todo = [p for p in find_files(paths) if known.get(p) != os.stat(p).st_mtime]
+        failed = []
+        rows = []
+        if todo:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [(path, pool.submit(extract, path)) for path in todo]
+                for path, future in futures:
+                    try:
+                        rows.append(future.result())
+                    except Exception as e:
+                        failed.append((path, e))
+        names = list(COLUMNS)
+        self.db.executemany(f"INSERT OR REPLACE INTO scans ({', '.join(names)}) "
+                            f"VALUES ({', '.join('?'*len(names))})",
+                            [[row[name] for name in names] for row in rows])
+        if prune:
+            gone = [(p,) for p in known if not os.path.exists(p)]
+            self.db.executemany("DELETE FROM scans WHERE path=?", gone)
+        self.db.commit()
+        return len(rows), failed
+
+    def query(self, **kwargs):
+        """
+        Returns the rows (dicts) matching all conditions, values are either exact or (min, max) ranges
+        (None for an open end). angle and date match files whose range overlaps the given one, e.g.
+        query(pixel_size=(0.5, 1.0), number_of_images=1601, angle=(-10, 10), date=("2021-01-01", None))
+        """
+        conditions = []
+        args = []
+        for key, value in kwargs.items():
+            low_col, high_col = RANGE_QUERIES.get(key, (key, key))
+            if low_col not in COLUMNS:
+                raise KeyError(f"Unknown column {key}")
+            if isinstance(value, (tuple, list)):
+                low, high = value
+                if low is not None:
+                    conditions.append(f'"{high_col}" >= ?')
+                    args.append(str(low) if key == "date" else low)
+                if high is not None:
+                    conditions.append(f'"{low_col}" <= ?')
+                    args.append(str(high) if key == "date" else high)
+            else:
+                conditions.append(f'"{low_col}" = ?')
+                args.append(value)
+        sql = "SELECT * FROM scans"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        rows = [dict(row) for row in self.db.execute(sql, args)]
+        for row in rows:
+            row["meta"] = json.loads(row["meta"])
+        return rows
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM scans").fetchone()[0]
@@ -0,0 +1,202 @@
+######################################################################################
+#  ______________   ___      ___   ______      ____        ____    __     _______    #
+# |_____    _____|  \  \    /  /  |  | \  \   |    \      /    |  |  |  /   ___   \  #
+#       |  |         \  \  /  /   |  |  |  |  |     \    /     |  |  |  |  |   |  |  #
+#       |  |          \  `´  /    |  | /  /   |  |\  \  /  /|  |  |  |  |  |   |  |  #
+#       |  |          /  /\  \    |  |\  \    |  | \  \/  / |  |  |  |  |  |   |  |  #
+#  _    |  |         /  /  \  \   |  | \  \   |  |  \ __ /  |  |  |  |  |  |___|  |  #
+# |_|   |__|        /__/    \__\  |__|  \__\  |__|          |__|  |__|  \ _______ /  #
+#                                                                                    #
+######################################################################################
+# This software was created by Mario Krake for ISEA at RWTH.                         #
+#                                                                                    #
+# Use at your own risk. Mario Krake and RWTH are not responsible for any kind of     #
+# damage including hardware and software, data loss, profit loss, or any other kind. #
+# By using the software you agree to the terms and conditions.                       #
+#                                                                                    #
+# Monetized and/or uncredited distribution is strongly prohibited.                   #
+######################################################################################
+
+# Just light modules are imported here, numpy and pythoncom are imported by the commands
+import os
+import sys
+import json
+import argparse
+
+
+def _print(result, as_json, lines=None):
+    """Prints json or the given text lines"""
+    if as_json or lines is None:
+        print(json.dumps(result, indent=2))
+    else:
+        for line in lines:
+            print(line)
+
+def _parse_indices(text, num_of_images):
+    """'start:stop:step' or '1,5,9' to the image indices (0-based)"""
+    import numpy as np
+    indices = np.arange(num_of_images)
+    if text is None:
+        return indices
+    if ":" in text:
+        return indices[slice(*[int(v) if v else None for v in text.split(":")])]
+    return indices[[int(v) for v in text.split(",")]]
+
+def _parse_roi(text):
+    """'y0:y1,x0:x1' to a tuple of slices"""
+    if text is None:
+        return ()
+    return tuple(slice(*[int(v) if v else None for v in part.split(":")]) for part in text.split(","))
+
+def info(args):
+    import txrmcatalog
+    from concurrent.futures import ProcessPoolExecutor
+    if len(args.files) == 1 or args.workers == 1:
+        rows = [txrmcatalog.extract(path) for path in args.files]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            rows = list(pool.map(txrmcatalog.extract, args.files))
+    result = []
+    for row in rows:
+        meta = json.loads(row.pop("meta"))
+        result.append({"path": row["path"], "file_size": row["file_size"], "mtime": row["mtime"], **meta})
+    _print(result[0] if len(result) == 1 else result, True)
+
+def ls(args):
+    import txrmio2
+    if args.native:
+        with txrmio2.CFB_File(args.file) as f:
+            entries = [(path, f.size(path)) for path in f.streams()]
+    else:
+        with txrmio2.OLE_Base(args.file, "r") as f:
+            entries = [(path, f.stream_size(path)) for path in f.streams]
+    _print([{"path": path, "size": size} for path, size in entries], args.json,
+           [f"{size:>12} {path}" for path, size in entries])
+
+def cat(args):
+    import txrmio2
+    if args.native:
+        with txrmio2.CFB_File(args.file) as f:
+            if not f.exists(args.stream):
+                sys.exit(f"{args.stream} does not exist")
+            data = f.read(args.stream)
+    else:
+        with txrmio2.OLE_Base(args.file, "r") as f:
+            if not f.exists(args.stream):
+                sys.exit(f"{args.stream} does not exist")
+            data = f.read_stream(args.stream)
+    sys.stdout.buffer.write(data)
+    sys.stdout.buffer.flush()
+
+def extract(args):
+    """Writes the images (and ROI) chunk by chunk to a raw file, stdout (-) or a .npy file"""
+    import numpy as np
+    import txrmio2
+    with txrmio2.TXRM_array(args.file, normalize=args.normalize, apply_shifts=args.apply_shifts,
+                            workers=args.workers, native=args.native or None) as arr:
+        indices = _parse_indices(args.indices, len(arr))
+        roi = _parse_roi(args.roi)
+        shape = np.empty(arr.img_shape, dtype=bool)[roi].shape
+        dtype = np.dtype(np.float32 if args.normalize else arr.img_dtype)
+        chunk = max(1, int(args.memory*2**20)//max(1, 2*dtype.itemsize*int(np.prod(arr.img_shape))))
+        npy = args.output.lower().endswith(".npy")
+        if npy:
+            out = np.lib.format.open_memmap(args.output, mode="w+", dtype=dtype, shape=(indices.size, *shape))
+        else:
+            out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+        try:
+            done = 0
+            for _, images in arr.iter_chunks(chunk, indices):
+                images = images[(slice(None), *roi)]
+                if npy:
+                    out[done:done+len(images)] = images
+                else:
+                    out.write(np.ascontiguousarray(images, dtype=dtype).tobytes())
+                done += len(images)
+        finally:
+            if npy:
+                out.flush()
+                del out
+            elif args.output != "-":
+                out.close()
+    if args.output != "-":
+        _print({"file": args.file, "output": args.output, "images": int(indices.size), "shape": [*shape],
+                "dtype": dtype.name, "chunk": chunk}, True)
+
+def convert(args):
+    """txrm to a txrma archive and back"""
+    import txrmarchive
+    if args.source.lower().endswith(".txrma"):
+        target = txrmarchive.restore(args.source, args.target, args.workers)
+    else:
+        target = txrmarchive.archive(args.source, args.target, args.codec, args.level, args.workers)
+    _print({"source": args.source, "target": target,
+            "source_size": os.path.getsize(args.source), "target_size": os.path.getsize(target)}, args.json,
+           [target])
+
+def compact(args):
+    import txrmio2
+    before = os.path.getsize(args.file)
+    with txrmio2.OLE_Base(args.file, "w") as f:
+        f.compact(args.target)
+    target = args.file if args.target is None else args.target
+    _print({"file": args.file, "target": target, "size_before": before, "size_after": os.path.getsize(target)},
+           args.json, [f"{before} -> {os.path.getsize(target)} bytes {target}"])
+
+def bench(args):
+    import txrmbench
+    txrmbench.main(args.options)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="txrmio", description="Bulk operations on .txrm files")
+    parser.add_argument("--json", action="store_true", help="Output json instead of text")
+    parser.add_argument("--workers", type=int, default=None, help="Number of threads/processes, default cpus")
+    parser.add_argument("--memory", type=float, default=512, help="Memory budget in MB for the image chunks")
+    parser.add_argument("--native", action="store_true", help="Read the files without pythoncom")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sub = commands.add_parser("info", help="Meta data as json, the images are not read")
+    sub.add_argument("files", nargs="+")
+    sub.set_defaults(func=info)
+    sub = commands.add_parser("ls", help="Streams and their sizes")
+    sub.add_argument("file")
+    sub.set_defaults(func=ls)
+    sub = commands.add_parser("cat", help="Raw bytes of a stream to stdout")
+    sub.add_argument("file")
+    sub.add_argument("stream", help="e.g. ImageInfo/Angles")
+    sub.set_defaults(func=cat)
+    sub = commands.add_parser("extract", help="Images to a raw file, stdout (-) or a .npy file")
+    sub.add_argument("file")
+    sub.add_argument("output")
+    sub.add_argument("--indices", default=None, help="start:stop:step or 1,5,9 (0-based), default all")
+    sub.add_argument("--roi", default=None, help="y0:y1,x0:x1")
+    sub.add_argument("--normalize", action="store_true", help="Divide by the reference (float32)")
+    sub.add_argument("--apply-shifts", action="store_true", help="Apply the alignment shifts")
+    sub.set_defaults(func=extract)
+    sub = commands.add_parser("convert", help="txrm to a txrma archive and back")
+    sub.add_argument("source")
+    sub.add_argument("target", nargs="?", default=None)
+    sub.add_argument("--codec", default=None, choices=["zlib", "lzma", "zstd", "lz4"])
+    sub.add_argument("--level", type=int, default=None)
+    sub.set_defaults(func=convert)
+    sub = commands.add_parser("compact", help="Rewrites the file without unused sectors")
+    sub.add_argument("file")
+    sub.add_argument("target", nargs="?", default=None, help="Default in place")
+    sub.set_defaults(func=compact)
+    sub = commands.add_parser("bench", help="Runs txrmbench, the options are passed on "
+                                               "(without pywin32 just with --file and the reading cases)")
+    sub.set_defaults(func=bench)
+
+    args, options = parser.parse_known_args(argv)
+    if options and args.command != "bench":
+        parser.error(f"unrecognized arguments: {' '.join(options)}")
+    args.options = options
+    try:
+        args.func(args)
+    except BrokenPipeError:
+        # e.g. piped into head, stdout is redirected so python does not fail again at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+######################################################################################
+#  ______________   ___      ___   ______      ____        ____    __     _______    #
+# |_____    _____|  \  \    /  /  |  | \  \   |    \      /    |  |  |  /   ___   \  #
+#       |  |         \  \  /  /   |  |  |  |  |     \    /     |  |  |  |  |   |  |  #
+#       |  |          \  `´  /    |  | /  /   |  |\  \  /  /|  |  |  |  |  |   |  |  #
+#       |  |          /  /\  \    |  |\  \    |  | \  \/  / |  |  |  |  |  |   |  |  #
+#  _    |  |         /  /  \  \   |  | \  \   |  |  \ __ /  |  |  |  |  |  |___|  |  #
+# |_|   |__|        /__/    \__\  |__|  \__\  |__|          |__|  |__|  \ _______ /  #
+#                                                                                    #
+######################################################################################
+# This software was created by Mario Krake for ISEA at RWTH.                         #
+#                                                                                    #
+# Use at your own risk. Mario Krake and RWTH are not responsible for any kind of     #
+# damage including hardware and software, data loss, profit loss, or any other kind. #
+# By using the software you agree to the terms and conditions.                       #
+#                                                                                    #
+# Monetized and/or uncredited distribution is strongly prohibited.                   #
+######################################################################################
+
+import os
+import json
+import hashlib
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import txrmio2
+from txrmcatalog import find_files
+
+
+ALGORITHM = "blake2b-128"
+# Bytes of read streams waiting for their hash at most
+MAX_PENDING_BYTES = 256*1024*1024
+
+
+def digest(data):
+    """Returns the hash of the bytes of one stream"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def cache_path(file_path):
+    return f"{file_path}.hashes"
+
+def _load_cache(file_path):
+    """Returns the cached hashes if they belong to the current file, otherwise None"""
+    stat = os.stat(file_path)
+    try:
+        with open(cache_path(file_path), "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if [cache.get("size"), cache.get("mtime"), cache.get("algorithm")] != \
+       [stat.st_size, stat.st_mtime_ns, ALGORITHM]:
+        return None
+    return cache["streams"]
+
+def _save_cache(file_path, hashes, stat):
+    try:
+        with open(cache_path(file_path), "w") as f:
+            json.dump({"size": stat.st_size, "mtime": stat.st_mtime_ns, "algorithm": ALGORITHM,
+                       "streams": hashes}, f)
+    except OSError:
+        # Readonly directories just have no cache
+        pass
+
+def hash_streams(file_path, workers=None, cache=True, native=False):
+    """
+    Returns {stream path: hash} of all streams of a file.
+    The streams are read one after another and hashed by workers threads, at most
+    MAX_PENDING_BYTES wait for their hash. With native the file is mapped (see txrmio2.CFB_File)
+    and the workers also read. The hashes are cached in file_path.hashes as long as the file is unchanged
+    """
+    if cache:
+        hashes = _load_cache(file_path)
+        if hashes is not None:
+            return hashes
+    stat = os.stat(file_path)
+    workers = os.cpu_count() if workers is None else workers
+    hashes = dict()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        if native:
+            with txrmio2.CFB_File(file_path) as f:
+                futures = [(path, pool.submit(lambda p: digest(f.view(p)), path)) for path in f.streams()]
+                hashes = {path: future.result() for path, future in futures}
+        else:
+            with txrmio2.OLE_Base(file_path, "r") as f:
+                pending = deque()
+                pending_bytes = 0
+                for path in f.streams:
+                    data = f.read_stream(path)
+                    pending.append((path, len(data), pool.submit(digest, data)))
+                    pending_bytes += len(data)
+                    while pending_bytes > MAX_PENDING_BYTES:
+                        path, size, future = pending.popleft()
+                        hashes[path] = future.result()
+                        pending_bytes -= size
+                for path, _, future in pending:
+                    hashes[path] = future.result()
+    hashes = dict(sorted(hashes.items()))
+    # Do not cache hashes of a file which changed while it was read
+    if cache and (os.stat(file_path).st_mtime_ns, os.stat(file_path).st_size) == (stat.st_mtime_ns, stat.st_size):
+        _save_cache(file_path, hashes, stat)
+    return hashes
+
+def content_hash(file_path, workers=None, cache=True, native=False):
+    """Returns one hash of all stream paths and their contents, equal for files with the same streams"""
+    hashes = hash_streams(file_path, workers, cache, native)
+    return digest("".join(f"{path}\0{value}\n" for path, value in sorted(hashes.items())).encode())
+
+def compare(old, new):
+    """
+    Compares two dicts of {stream path: hash}.
+    Returns a dict with the sorted lists added, removed, changed and the number of unchanged streams
+    """
+    return {
+        "added": sorted(set(new) - set(old)),
+        "removed": sorted(set(old) - set(new)),
+        "changed": sorted(path for path in set(old) & set(new) if old[path] != new[path]),
+        "unchanged": sum(1 for path in set(old) & set(new) if old[path] == new[path]),
+    }
+
+def diff(old_path, new_path, workers=None, cache=True, native=False):
+    """Returns which streams were added, removed or changed from old_path to new_path, see compare"""
+    return compare(hash_streams(old_path, workers, cache, native), hash_streams(new_path, workers, cache, native))
+
+def verify(file_path, expected=None, workers=None, native=False):
+    """
+    Hashes the file again and compares it to expected ({stream path: hash}, defaults to the cached hashes),
+    e.g. after a save. Returns the result of compare, the file is fine if added, removed and changed are empty
+    """
+    if expected is None:
+        try:
+            with open(cache_path(file_path), "r") as f:
+                expected = json.load(f)["streams"]
+        except (OSError, ValueError, KeyError):
+            raise IOError(f"No hashes to verify {file_path} against")
+    return compare(expected, hash_streams(file_path, workers, cache=False, native=native))
+
+def duplicates(paths, workers=None, cache=True, native=False):
+    """Returns lists of files (in the given files and directories) with the same content hash"""
+    groups = dict()
+    for path in find_files(paths):
+        groups.setdefault(content_hash(path, workers, cache, native), []).append(path)
+    return [group for group in groups.values() if len(group) > 1]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream hashes of .txrm files")
+    parser.add_argument("command", choices=["hash", "diff", "verify", "duplicates"])
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--native", action="store_true", help="Read the files without pythoncom")
+    args = parser.parse_args(argv)
+    cache = not args.no_cache
+    if args.command == "hash":
+        result = {path: hash_streams(path, args.workers, cache, args.native) for path in args.paths}
+    elif args.command == "diff":
+        if len(args.paths) != 2:
+            parser.error("diff needs two files")
+        result = diff(*args.paths, args.workers, cache, args.native)
+    elif args.command == "verify":
+        result = {path: verify(path, workers=args.workers, native=args.native) for path in args.paths}
+    else:
+        result = duplicates(args.paths, args.workers, cache, args.native)
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -17,13 +17,22 @@
 # Monetized and/or uncredited distribution is strongly prohibited.                   #
 ######################################################################################
 
-import pythoncom
-from win32com.storagecon import STGM_READWRITE, STGM_SHARE_EXCLUSIVE, STGFMT_STORAGE
 import numpy as np
 from numpy import uint16, uint32, float32
 import shutil
 import os
+import time
+import zlib
+import mmap
+import json
+import threading
+import logging
+import functools
+import warnings
 from copy import deepcopy
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 
 # Self Information
@@ -32,29 +41,190 @@ __future__ = """Planned is to increase the speed and decrease the needed RAM for
 Also check for enough space before saving.
 Try to find a way to provide functionality to more platforms.
 Rewrite some code.
-Add functionality to IO, like Dates and Motorpositions.
-Possibility to reduce file size.
 Possibility for faster and optimized writing."""
-__issues__ = """Can't reduce filesize.
-Can't increase number of images for every file, much manual tweaking."""
+__issues__ = """"""
 
 # Global Flags
 ANGLE_UNIT = "degree"
 MAX_CONST_DEVIATION = 0.1
 __AUTO_FORMAT_DATES = True
 MAKE_BACKUP = False
+# Images prepared (converted to bytes) ahead of the writer on save, bounds the extra memory
+SAVE_PIPELINE_DEPTH = 8
+# Threads preparing the images on save, None for the number of cpus (at most SAVE_PIPELINE_DEPTH)
+SAVE_WORKERS = None
+
+# Profiling of the IO, None when disabled (see enable_profiling)
+PROFILER = None
+# Backend to open files: "com" (pythoncom of pywin32), "native" (readonly, see CFB_File)
+# or None for com if pywin32 is installed, otherwise native
+BACKEND = None
+
+# pythoncom is imported on the first open (see _com), the constants are the ones of win32com.storagecon
+pythoncom = None
+STGM_READ = 0x0
+STGM_READWRITE = 0x2
+STGM_SHARE_EXCLUSIVE = 0x10
+STGM_SHARE_DENY_WRITE = 0x20
+STGM_CREATE = 0x1000
+STGM_TRANSACTED = 0x10000
+STGC_DEFAULT = 0
+STGFMT_STORAGE = 0
+STGMOVE_MOVE = 0
+
+
+class IO_Stats:
+    """
+    Counts and times the IO of OLE_Base, TXRM_array and TXRM_IO:
+    storage opens, stream reads/writes, moved bytes, cache hits and the phases of loading and saving.
+    callback(name, seconds, nbytes) is called for every recorded event
+    """
+    def __init__(self, callback=None):
+        self.callback = callback
+        # Events also come from the worker threads of loading and saving
+        self.__lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counts = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.nbytes = defaultdict(int)
+
+    def event(self, name, seconds=0.0, nbytes=0):
+        with self.__lock:
+            self.counts[name] += 1
+            self.seconds[name] += seconds
+            self.nbytes[name] += nbytes
+        if self.callback is not None:
+            self.callback(name, seconds, nbytes)
+
+    def call(self, name, func, *args, **kwargs):
+        """Calls func and records the time and the bytes read (result) or written (bytes arguments)"""
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        # The native reader returns memoryviews of the mapped file
+        size = lambda v: v.nbytes if isinstance(v, memoryview) else len(v)
+        if isinstance(result, (bytes, memoryview)):
+            nbytes = size(result)
+        elif isinstance(result, dict):
+            nbytes = sum(size(v) for v in result.values() if isinstance(v, (bytes, memoryview)))
+        else:
+            nbytes = sum(size(a) for a in args if isinstance(a, (bytes, memoryview)))
+        self.event(name, elapsed, nbytes)
+        return result
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.event(f"phase:{name}", time.perf_counter() - start)
+
+    def summary(self):
+        """Returns a table of all events sorted by the total time"""
+        lines = [f"{'event':<24}{'count':>9}{'total [s]':>12}{'mean [ms]':>12}{'MB':>10}{'MB/s':>10}"]
+        for name in sorted(self.counts, key=lambda n: -self.seconds[n]):
+            count, seconds, nbytes = self.counts[name], self.seconds[name], self.nbytes[name]
+            mb_per_s = f"{nbytes/seconds/1e6:.1f}" if nbytes and seconds else "-"
+            lines.append(f"{name:<24}{count:>9}{seconds:>12.4f}{seconds/count*1e3:>12.4f}"
+                         f"{nbytes/1e6:>10.2f}{mb_per_s:>10}")
+        return "\n".join(lines)
+
+def enable_profiling(callback=None, log=False):
+    """
+    Starts recording the IO in a new IO_Stats object and returns it.
+    With log every event is also logged with logging.getLogger("txrmio2").debug
+    """
+    global PROFILER
+    if log:
+        logger = logging.getLogger("txrmio2")
+        user_callback = callback
+        def callback(name, seconds, nbytes):
+            logger.debug("%s %.6f s %d bytes", name, seconds, nbytes)
+            if user_callback is not None:
+                user_callback(name, seconds, nbytes)
+    PROFILER = IO_Stats(callback)
+    return PROFILER
+
+def disable_profiling():
+    """Stops recording and returns the IO_Stats of the recording"""
+    global PROFILER
+    stats, PROFILER = PROFILER, None
+    return stats
+
+def _profiled(name):
+    """Records the calls of the decorated method, just a None check while profiling is disabled"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if PROFILER is None:
+                return func(*args, **kwargs)
+            return PROFILER.call(name, func, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def _count(name):
+    if PROFILER is not None:
+        PROFILER.event(name)
+
+@contextmanager
+def _phase(name):
+    if PROFILER is None:
+        yield
+    else:
+        with PROFILER.phase(name):
+            yield
+
+def _com():
+    """Returns pythoncom, it is imported on the first call. Raises ImportError without pywin32"""
+    global pythoncom
+    if pythoncom is None:
+        try:
+            import pythoncom as module
+        except ImportError:
+            raise ImportError("pythoncom of pywin32 is needed to write files (or set BACKEND = 'native' to read)")
+        pythoncom = module
+    return pythoncom
+
+def _native(write=False):
+    """Returns if the next file is opened with the native reader"""
+    if BACKEND == "native":
+        if write:
+            raise IOError("The native backend can just read files")
+        return True
+    if BACKEND == "com" or write:
+        _com()
+        return False
+    try:
+        _com()
+        return False
+    except ImportError:
+        return True
+
+###################################################################################################
 
 class OLE_Base:
     """
     Base class for OLE/CBF files.
     Provides read and write methods, does not convert, prepare or handle data (structure)
+    With transacted (write mode) changes are buffered until they are committed in one go by transaction()
     """
 
-    def __init__(self, file_path, mode="r"):
+    def __init__(self, file_path, mode="r", transacted=False):
         self.file_path = file_path
-        self.MODUS = STGM_READWRITE|STGM_SHARE_EXCLUSIVE
         self.ifile = None
         self.__mode =  "w" if mode.lower() == "w" else "r"
+        self.__streams = None
+        self.transacted = transacted and self.__mode == "w"
+        if self.__mode == "w":
+            self.MODUS = STGM_READWRITE|STGM_SHARE_EXCLUSIVE
+            self.ROOT_MODUS = self.MODUS|STGM_TRANSACTED if self.transacted else self.MODUS
+        else:
+            # Readonly files can be opened by several readers at once, the elements inside stay exclusive
+            self.MODUS = STGM_READ|STGM_SHARE_EXCLUSIVE
+            self.ROOT_MODUS = STGM_READ|STGM_SHARE_DENY_WRITE
 
     def __del__(self):
         self.close()
@@ -67,37 +237,112 @@ class OLE_Base:
         self.close()
     
     def open(self):
-        try:
-            self.ifile = pythoncom.StgOpenStorageEx(self.file_path, self.MODUS, STGFMT_STORAGE, 0,
-                                                pythoncom.IID_IStorage)
-        except:
-            self.ifile = pythoncom.StgCreateStorageEx(self.file_path, self.MODUS, STGFMT_STORAGE, 0,
-                                                pythoncom.IID_IStorage)
-        self.__streams = sorted(self._build_streams())
+        if self.__mode == "r" and _native():
+            self.ifile = CFB_Storage(CFB_File(self.file_path))
+        elif self.__mode == "r":
+            self.ifile = _com().StgOpenStorageEx(self.file_path, self.ROOT_MODUS, STGFMT_STORAGE, 0,
+                                                 pythoncom.IID_IStorage)
+        else:
+            _native(write=True)
+            try:
+                self.ifile = _com().StgOpenStorageEx(self.file_path, self.ROOT_MODUS, STGFMT_STORAGE, 0,
+                                                     pythoncom.IID_IStorage)
+            except:
+                self.ifile = _com().StgCreateStorageEx(self.file_path, self.ROOT_MODUS, STGFMT_STORAGE, 0,
+                                                       pythoncom.IID_IStorage)
+        # The stream list is built on first use, metadata reads do not need it
+        self.__streams = None
+        # Just now no writer can have the file open, the native reader does not lock it
+        if not isinstance(self.ifile, CFB_Storage):
+            self.__recover()
 
     def close(self):  # Remove ifile from scope
         if hasattr(self,"ifile"):
+            if isinstance(self.ifile, CFB_Storage):
+                self.ifile.close()
             del self.ifile
-        if hasattr(self, "__streams"):
-            self.__streams = []
-            del self.__streams
+        self.__streams = None
+
+    @property
+    def journal_path(self):
+        return f"{self.file_path}.journal"
+
+    def __recover(self):
+        """
+        A left journal means a save did not finish. The changes of a transaction are either
+        all committed or none, so the file is consistent and the journal just tells which one
+        """
+        if not os.path.exists(self.journal_path):
+            return
+        try:
+            with open(self.journal_path, "r") as f:
+                journal = json.load(f)
+        except ValueError:
+            journal = dict()
+        stat = os.stat(self.file_path) if os.path.exists(self.file_path) else None
+        if stat is not None and [stat.st_size, stat.st_mtime_ns] == [journal.get("size"), journal.get("mtime")]:
+            print("The last save of", self.file_path, "did not finish and was rolled back")
+        else:
+            print("The last save of", self.file_path, "was interrupted after its commit, the file is saved")
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def transaction(self, plan=None):
+        """
+        Writes the journal with the planned changes, commits all changes of the block at once
+        and reverts them on errors. Without transacted the changes are written directly
+        """
+        if not self.transacted:
+            yield
+            return
+        stat = os.stat(self.file_path)
+        journal = {"file": self.file_path, "size": stat.st_size, "mtime": stat.st_mtime_ns,
+                   "started": time.time(), "plan": plan or dict()}
+        with open(self.journal_path, "w") as f:
+            json.dump(journal, f)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            yield
+            with _phase("commit"):
+                self.ifile.Commit(STGC_DEFAULT)
+        except BaseException:
+            self.ifile.Revert()
+            self.__streams = None
+            raise
+        finally:
+            try:
+                os.remove(self.journal_path)
+            except FileNotFoundError:
+                pass
+
+    def _stream_list(self):
+        """Returns the list of streams, builds it on first use"""
+        if self.__streams is None:
+            with _phase("stream_list"):
+                self.__streams = sorted(self._build_streams())
+        else:
+            _count("cache_hit:stream_list")
+        return self.__streams
     
-    def _build_streams(self, root=None, path=[], tree=[], storages=False):
+    def _build_streams(self, root=None, path=None, tree=None, storages=False):
         """
         Iterative function to generate list of streams
         """
-        modus = STGM_READWRITE|STGM_SHARE_EXCLUSIVE
+        path = [] if path is None else path
+        tree = [] if tree is None else tree
         if not root:
             root = self.ifile
-            if len(path)>0:
-                path = []
-                tree = []
 
         for element in root.EnumElements():
             path.append(element[0])
             typ = element[1]
             if typ==1:
-                strg = root.OpenStorage(element[0], None, modus, None)
+                _count("storage_open")
+                strg = root.OpenStorage(element[0], None, self.MODUS, None)
                 tree = self._build_streams(strg, list(path), tree, storages)
             else:
                 tree.append("/".join(path))
@@ -108,18 +353,21 @@ class OLE_Base:
         del path
         return tree
     
+    @_profiled("remove_stream")
     def remove_stream(self, stream):
         """Removes the given stream and returns (True, None) if sucessfull 
         and (False, Error) when failed
-        NOTE: Currently this does not change the filesize"""
+        NOTE: This does not change the filesize, use compact afterwards"""
         if self.__mode=="r":
             raise Exception("Can't remove streams in read mode")
+        full_path = stream
         stream = stream.split("/")
         stream_path = stream[:-1]
         stream = stream[-1]
         istorages = [self.ifile]
         for path in stream_path:
             try:
+                _count("storage_open")
                 istorages.append(istorages[-1].OpenStorage(path, None, self.MODUS, None))
             except Exception as e:
                 return False, e
@@ -127,13 +375,13 @@ class OLE_Base:
             istorages[-1].DestroyElement(stream)
         except Exception as e:
             return False, e
-        if stream in self.__streams:
-            self.__streams.remove(stream)
+        streams = self._stream_list()
+        if full_path in streams:
+            streams.remove(full_path)
         else:
-            streams = deepcopy(self.__streams)
-            for s in streams:
-                if s.startswith(stream+"/"):
-                    self.__streams.remove(s)
+            for s in deepcopy(streams):
+                if s.startswith(full_path+"/"):
+                    streams.remove(s)
         return True, None
         
     def clear_file(self, skip_dialog_for_safety=False):
@@ -151,7 +399,7 @@ class OLE_Base:
                 print("Abort")
                 return
 
-        streams = deepcopy(self.__streams)
+        streams = deepcopy(self._stream_list())
         i = 0
         for stream in streams:
             sucess, err = self.remove_stream(stream)
@@ -161,21 +409,24 @@ class OLE_Base:
             if i>6:
                 exit()
         
-        storages = self.__build_streams(storages=True)
+        storages = self._build_streams(storages=True)
         for storage in storages:
             self.remove_stream(storage)
 
+    @_profiled("exists")
     def exists(self, stream):
         """Returns if a given stream was found in the stream building process"""
-        if stream in self.__streams:
+        streams = self._stream_list()
+        if stream in streams:
             return True
         else:
-            for s in self.__streams:
+            for s in streams:
                 if s.startswith(stream+"/"):
                     return True
             else:
                 return False
 
+    @_profiled("read_stream")
     def read_stream(self, stream):
         """Returns the bytestring of a given stream, if no stream was found or an error occured returns b'' """
         stream = stream.split("/")
@@ -184,6 +435,7 @@ class OLE_Base:
         istorages = [self.ifile]
         for path in stream_path:
             try:
+                _count("storage_open")
                 istorages.append(istorages[-1].OpenStorage(path, None, self.MODUS, None))
             except:
                 return b""
@@ -196,6 +448,50 @@ class OLE_Base:
         except:
             return b""
 
+    def stream_size(self, stream):
+        """Returns the size of a stream in bytes without reading it, -1 if it does not exist"""
+        *stream_path, stream = stream.split("/")
+        istorage = self.ifile
+        try:
+            for path in stream_path:
+                istorage = istorage.OpenStorage(path, None, self.MODUS, None)
+            return int(istorage.OpenStream(stream, None, self.MODUS, 0).Stat()[2])
+        except:
+            return -1
+
+    @_profiled("read_streams")
+    def read_streams(self, streams):
+        """
+        Returns a dict with the bytestrings of the given streams, missing streams are b''.
+        Every storage is just opened once for all streams
+        """
+        istorages = {"": self.ifile}
+        out = dict()
+        for stream in streams:
+            *stream_path, name = stream.split("/")
+            key = ""
+            for path in stream_path:
+                parent = istorages[key]
+                key = f"{key}/{path.lower()}"
+                if key not in istorages:
+                    _count("storage_open")
+                    try:
+                        istorages[key] = None if parent is None else parent.OpenStorage(path, None, self.MODUS, None)
+                    except:
+                        istorages[key] = None
+                else:
+                    _count("cache_hit:storage")
+            if istorages[key] is None:
+                out[stream] = b""
+                continue
+            try:
+                istream = istorages[key].OpenStream(name, None, self.MODUS, 0)
+                out[stream] = istream.Read(istream.Stat()[2])
+            except:
+                out[stream] = b""
+        return out
+
+    @_profiled("write_stream")
     def write_stream(self, stream_path, data):
         """
         Approach to automatically open storage paths till stream and save data.
@@ -214,6 +510,7 @@ class OLE_Base:
         istorages = [self.ifile]
         for path in stream_path_:
             try:
+                _count("storage_open")
                 istorages.append(istorages[-1].OpenStorage(path, None, self.MODUS, None))
             except:
                 istorages.append(istorages[-1].CreateStorage(path, self.MODUS, 0))
@@ -223,61 +520,565 @@ class OLE_Base:
             istream = istorages[-1].CreateStream(stream, self.MODUS, 0)
         istream.SetSize(len(data))
         istream.Write(data)
-        if not stream_path_ in self.__streams:
-            self.__streams.append(stream_path_)
+        if not stream_path in self._stream_list():
+            self.__streams.append(stream_path)
+
+    @_profiled("compact")
+    def compact(self, file_path=None):
+        """
+        Copies all streams and storages into a fresh file to get rid of the space of removed
+        or shrunk streams. Without file_path the file itself is replaced by the compacted copy.
+        Returns the path of the compacted file
+        """
+        if self.__mode=="r" and file_path is None:
+            raise Exception("Can't compact in place in read mode")
+        target = f"{self.file_path}.compact" if file_path is None else file_path
+        modus = STGM_READWRITE|STGM_SHARE_EXCLUSIVE|STGM_CREATE
+        istorage = _com().StgCreateStorageEx(target, modus, STGFMT_STORAGE, 0, pythoncom.IID_IStorage)
+        self.ifile.CopyTo(None, None, istorage)
+        istorage.Commit(0)
+        del istorage
+        if file_path is None:
+            self.close()
+            os.replace(target, self.file_path)
+            self.open()
+        return self.file_path if file_path is None else file_path
 
     @property
     def streams(self):
         """Returns a list of all found streams in the stream build process"""
-        return self.__streams
+        return self._stream_list()
 
 # For old code to work
 TXRM_Handle = OLE_Base
 
 ###################################################################################################
 
+class CFB_File:
+    """
+    Native readonly parser of the compound file binary format, works without pythoncom.
+    Gives the directory of all storages/streams and where their data lies in the file
+    """
+    SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+    ENDOFCHAIN = 0xFFFFFFFE
+    NOSTREAM = 0xFFFFFFFF
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.file = open(file_path, "rb")
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            self.file.close()
+            raise IOError(f"{file_path} is not a compound file")
+        if self.data[:8] != self.SIGNATURE:
+            self.close()
+            raise IOError(f"{file_path} is not a compound file")
+        header = self.data[:512]
+        self.sector_size = 1 << int.from_bytes(header[0x1E:0x20], "little")
+        self.mini_sector_size = 1 << int.from_bytes(header[0x20:0x22], "little")
+        first_dir, _, self.mini_cutoff, first_minifat, num_minifat, first_difat, num_difat = \
+            np.frombuffer(header, dtype="<u4", count=7, offset=0x30)
+        # The FAT sectors are listed in the header and the DIFAT chain
+        fat_sectors = [s for s in np.frombuffer(header, dtype="<u4", count=109, offset=0x4C) if s < self.ENDOFCHAIN]
+        difat = first_difat
+        for _ in range(num_difat):
+            if difat >= self.ENDOFCHAIN:
+                break
+            values = self.__sector_values(difat)
+            fat_sectors.extend(s for s in values[:-1] if s < self.ENDOFCHAIN)
+            difat = values[-1]
+        self.fat = np.concatenate([self.__sector_values(s) for s in fat_sectors]) if fat_sectors \
+                   else np.zeros(0, dtype="<u4")
+        self.minifat = np.frombuffer(self.__read_chain(first_minifat), dtype="<u4") if num_minifat \
+                       else np.zeros(0, dtype="<u4")
+        self.__entries = np.frombuffer(self.__read_chain(first_dir), dtype=np.uint8).reshape(-1, 128)
+        self.__mini_offsets = self.__offsets(self.__entry(0)["start"], self.fat, self.sector_size)
+        # Path: entry of all elements
+        self.entries = dict()
+        self.__walk(self.__entry(0)["child"], "")
+
+    def __enter__(self):  # Neccessary for contextmanager
+        return self
+
+    def __exit__(self, type, value, traceback):  # Neccessary for contextmanager
+        self.close()
+
+    def close(self):
+        if getattr(self, "data", None) is not None:
+            try:
+                self.data.close()
+            except BufferError:
+                # Views (e.g. from view()) are still alive, the map is freed with them
+                pass
+            self.file.close()
+            self.data = None
+
+    def __sector_values(self, sector):
+        offset = (int(sector)+1)*self.sector_size
+        return np.frombuffer(self.data, dtype="<u4", count=self.sector_size//4, offset=offset)
+
+    def __chain(self, start, fat):
+        """Returns the sector numbers of the chain starting at start"""
+        chain = []
+        sector = int(start)
+        while sector < self.ENDOFCHAIN and sector < fat.size and len(chain) <= fat.size:
+            chain.append(sector)
+            sector = int(fat[sector])
+        return np.array(chain, dtype=np.int64)
+
+    def __offsets(self, start, fat, size):
+        """Returns the file offsets of the sectors of a chain"""
+        chain = self.__chain(start, fat)
+        if fat is self.fat:
+            return (chain+1)*self.sector_size
+        # Mini sectors lie inside the mini stream of the root entry
+        position = chain*self.mini_sector_size
+        return self.__mini_offsets[position//self.sector_size] + position%self.sector_size
+
+    def __read_chain(self, start):
+        return b"".join(self.data[o:o+self.sector_size] for o in self.__offsets(start, self.fat, self.sector_size))
+
+    def __entry(self, index):
+        raw = self.__entries[index]
+        name_length = int.from_bytes(raw[64:66].tobytes(), "little")
+        values = raw[68:80].view("<u4")
+        return {
+            "name": raw[:max(name_length-2, 0)].tobytes().decode("utf-16-le"),
+            "type": int(raw[66]),
+            "left": int(values[0]), "right": int(values[1]), "child": int(values[2]),
+            "start": int(raw[116:120].view("<u4")[0]),
+            "size": int(raw[120:128].view("<u8")[0]) if self.sector_size > 512 else int(raw[120:124].view("<u4")[0]),
+        }
+
+    def __walk(self, index, path):
+        """Iterates the red black tree of siblings and the children of storages"""
+        todo = [index]
+        while todo:
+            index = todo.pop()
+            if index >= self.NOSTREAM or index >= len(self.__entries):
+                continue
+            entry = self.__entry(index)
+            todo += [entry["left"], entry["right"]]
+            full_path = f"{path}/{entry['name']}" if path else entry["name"]
+            self.entries[full_path] = entry
+            if entry["type"] == 1:
+                self.__walk(entry["child"], full_path)
+
+    def __get(self, path):
+        entry = self.entries.get(path)
+        if entry is None:
+            # Names are case insensitive
+            lower = path.lower()
+            for key, value in self.entries.items():
+                if key.lower() == lower:
+                    return value
+        return entry
+
+    def streams(self):
+        """Returns the sorted paths of all streams"""
+        return sorted(path for path, entry in self.entries.items() if entry["type"] == 2)
+
+    def exists(self, path):
+        return self.__get(path) is not None
+
+    def size(self, path):
+        entry = self.__get(path)
+        return 0 if entry is None else entry["size"]
+
+    def runs(self, path):
+        """
+        Returns the (file_offset, length) runs of the data of a stream, consecutive sectors are merged
+        """
+        entry = self.__get(path)
+        if entry is None or entry["type"] != 2 or entry["size"] == 0:
+            return []
+        if entry["size"] < self.mini_cutoff:
+            offsets, size = self.__offsets(entry["start"], self.minifat, self.mini_sector_size), self.mini_sector_size
+        elif self.__contiguous(entry["start"], -(-entry["size"]//self.sector_size)):
+            return [((entry["start"]+1)*self.sector_size, entry["size"])]
+        else:
+            offsets, size = self.__offsets(entry["start"], self.fat, self.sector_size), self.sector_size
+        offsets = offsets[:-(-entry["size"]//size)]
+        breaks = np.flatnonzero(np.diff(offsets) != size) + 1
+        starts = np.concatenate([[0], breaks])
+        ends = np.concatenate([breaks, [offsets.size]])
+        runs = [[int(offsets[s]), int(e-s)*size] for s, e in zip(starts, ends)]
+        runs[-1][1] -= sum(r[1] for r in runs) - entry["size"]
+        return [tuple(r) for r in runs]
+
+    def __contiguous(self, start, count):
+        """True if the chain of count sectors from start lies in consecutive sectors"""
+        if start + count > self.fat.size:
+            return False
+        return bool(np.all(self.fat[start:start+count-1] == np.arange(start+1, start+count)))
+
+    def read(self, path):
+        """Returns the bytes of a stream, b'' if it does not exist"""
+        return b"".join(self.data[o:o+n] for o, n in self.runs(path))
+
+    def view(self, path):
+        """
+        Returns a readonly memoryview of a stream without copying if its sectors are consecutive,
+        otherwise the copied bytes
+        """
+        runs = self.runs(path)
+        if len(runs) == 1:
+            offset, length = runs[0]
+            return memoryview(self.data)[offset:offset+length]
+        return b"".join(self.data[o:o+n] for o, n in runs)
+
+    def entry(self, path):
+        """Returns the directory entry of a storage/stream (names are case insensitive), None if not existing"""
+        return self.__get(path)
+
+    def children(self, path):
+        """Returns the paths of the elements directly inside a storage ("" for the root)"""
+        prefix = f"{path}/" if path else ""
+        return sorted(key for key in self.entries if key.startswith(prefix) and "/" not in key[len(prefix):])
+
+
+class CFB_Storage:
+    """
+    Readonly storage of a CFB_File with the methods of pythoncom storages which OLE_Base uses for reading,
+    so files can be read without pywin32
+    """
+    def __init__(self, cfb, path=""):
+        self.cfb = cfb
+        self.path = path
+
+    def close(self):
+        self.cfb.close()
+
+    def __element(self, name, typ):
+        path = f"{self.path}/{name}" if self.path else name
+        entry = self.cfb.entry(path)
+        if entry is None or entry["type"] != typ:
+            raise IOError(f"{path} not found")
+        # Keep the stored case of the name
+        return f"{self.path}/{entry['name']}" if self.path else entry["name"]
+
+    def EnumElements(self):
+        return [(self.cfb.entries[p]["name"], self.cfb.entries[p]["type"], self.cfb.entries[p]["size"])
+                for p in self.cfb.children(self.path)]
+
+    def OpenStorage(self, name, *args):
+        return CFB_Storage(self.cfb, self.__element(name, 1))
+
+    def OpenStream(self, name, *args):
+        return CFB_Stream(self.cfb, self.__element(name, 2))
+
+
+class CFB_Stream:
+    """Readonly stream of a CFB_File, see CFB_Storage"""
+    def __init__(self, cfb, path):
+        self.cfb = cfb
+        self.path = path
+        self.position = 0
+
+    def Stat(self, *args):
+        return (self.path.rsplit("/", 1)[-1], 2, self.cfb.size(self.path))
+
+    def Read(self, size):
+        data = self.cfb.read(self.path)[self.position:self.position+size]
+        self.position += len(data)
+        return data
+
+###################################################################################################
+
+def _shift_integer(image, dy, dx, out, fill=0):
+    """out[y, x] = image[y-dy, x-dx] for integer shifts, uncovered pixels get fill"""
+    height, width = image.shape
+    out[...] = fill
+    if abs(dy) >= height or abs(dx) >= width:
+        return out
+    out[max(dy, 0):height+min(dy, 0), max(dx, 0):width+min(dx, 0)] = \
+        image[max(-dy, 0):height+min(-dy, 0), max(-dx, 0):width+min(-dx, 0)]
+    return out
+
+def shift_image(image, dy, dx, out=None, fill=0):
+    """
+    Shifts an image by (dy, dx) pixels: out[y, x] = image[y-dy, x-dx].
+    Integer shifts are just slicing, sub pixel shifts are bilinear interpolated
+    """
+    out = np.empty_like(image) if out is None else out
+    dy, dx = float(np.nan_to_num(dy)), float(np.nan_to_num(dx))
+    iy, ix = int(np.floor(dy)), int(np.floor(dx))
+    fy, fx = dy-iy, dx-ix
+    if fy == 0 and fx == 0:
+        return _shift_integer(image, iy, ix, out, fill)
+    result = np.zeros(image.shape, dtype=float32)
+    temp = np.empty(image.shape, dtype=float32)
+    for oy, ox, weight in ((0, 0, (1-fy)*(1-fx)), (0, 1, (1-fy)*fx), (1, 0, fy*(1-fx)), (1, 1, fy*fx)):
+        if weight == 0:
+            continue
+        _shift_integer(image, iy+oy, ix+ox, temp, fill)
+        temp *= weight
+        result += temp
+    if out.dtype.kind in "ui":
+        info = np.iinfo(out.dtype)
+        np.clip(np.rint(result, out=result), info.min, info.max, out=result)
+    out[...] = result
+    return out
+
+def _prepare_image(image, dtype):
+    """Returns the bytes of an image as they are stored"""
+    if PROFILER is None:
+        return np.ascontiguousarray(image, dtype=dtype).tobytes()
+    return PROFILER.call("tobytes", lambda: np.ascontiguousarray(image, dtype=dtype).tobytes())
+
+def _read_images(read_image, indices, out, shifts=None, workers=None):
+    """
+    Reads the images read_image(index) of indices into out.
+    With shifts ((y_shifts, x_shifts) per index) the images are shifted in a thread pool
+    while the next ones are read, every image is written straight into out
+    """
+    if shifts is None:
+        for i, j in enumerate(indices):
+            out[i] = read_image(j)
+        return out
+    y_shifts, x_shifts = shifts
+    workers = os.cpu_count() if workers is None else workers
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for i, j in enumerate(indices):
+            pending.append(pool.submit(shift_image, read_image(j), y_shifts[j], x_shifts[j], out[i]))
+            if len(pending) > 2*workers:
+                pending.popleft().result()
+        for future in pending:
+            future.result()
+    return out
+
+def plan_memory(num_of_images, image_shape, image_dtype, memory_budget=None, normalize=False,
+                apply_shifts=False, workers=None, eager=True, mapped=False, writing=False):
+    """
+    Estimates from the header values how much memory reading the images needs and chooses
+    how to read them within memory_budget (bytes, None is unlimited):
+        "eager":   all images are loaded at once (TXRM_IO)
+        "mmap":    slices are views of the mapped file, just index lists are copied (chunk images at most)
+        "chunked": chunk images are read at once
+        "stream":  one image at a time
+    eager=False skips loading everything, mapped tells that the images are one view of the file (native),
+    writing adds the images in flight while saving.
+    Returns a dict with strategy, chunk, image_bytes, stack_bytes, peak_bytes and memory_budget,
+    raises MemoryError if not even one image fits
+    """
+    pixels = int(np.prod(image_shape))
+    image_bytes = pixels*np.dtype(image_dtype).itemsize
+    out_bytes = pixels*4 if normalize else image_bytes
+    reference = pixels*4 if normalize else 0
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    # Images read but not yet written to the output (see _read_images)
+    in_flight = image_bytes*(2*workers+1 if apply_shifts else 1)
+    if writing:
+        in_flight += SAVE_PIPELINE_DEPTH*image_bytes
+    plan = {"image_bytes": image_bytes, "stack_bytes": num_of_images*image_bytes, "memory_budget": memory_budget}
+    peak = num_of_images*out_bytes + in_flight + reference
+    if memory_budget is None or peak <= memory_budget:
+        if eager:
+            plan.update(strategy="eager", chunk=num_of_images, peak_bytes=peak)
+            return plan
+        chunk = max(num_of_images, 1)
+    elif mapped and not normalize and not apply_shifts:
+        chunk = memory_budget//max(image_bytes, 1)
+    else:
+        chunk = (memory_budget - in_flight - reference)//max(out_bytes, 1)
+    if chunk < 1:
+        raise MemoryError(f"Not even one image ({image_bytes} bytes) fits into the memory budget of "
+                          f"{memory_budget} bytes")
+    chunk = int(min(chunk, max(num_of_images, 1)))
+    if mapped and not normalize and not apply_shifts:
+        plan.update(strategy="mmap", chunk=chunk, peak_bytes=chunk*image_bytes)
+    else:
+        plan.update(strategy="stream" if chunk == 1 else "chunked", chunk=chunk,
+                    peak_bytes=chunk*out_bytes + in_flight + reference)
+    return plan
+
+def _report_memory(file_path, plan):
+    print(f"{os.path.basename(file_path)}: {plan['strategy']} ({plan['chunk']} images at once),",
+          f"projected peak {plan['peak_bytes']/2**20:.1f} MB of {plan['memory_budget']/2**20:.1f} MB")
+
+def _default_chunk(array, chunk, share=1):
+    """chunk or the chunk of the memory plan of array shared by share readers, 32 without a plan"""
+    if chunk is not None:
+        return chunk
+    plan = getattr(array, "memory_plan", None)
+    return 32 if plan is None else max(1, plan["chunk"]//share)
+
+###################################################################################################
+
+class Angle_Index:
+    """
+    Sorted index of the projection angles to select projections by angle.
+    The queries take angles in the unit of the given angles and return projection indices
+    in ascending order, which can be passed on to TXRM_array or images[...] directly
+    """
+    def __init__(self, angles):
+        self.angles = np.array(angles, dtype=np.float64).ravel()
+        self.order = np.argsort(self.angles, kind="stable")
+        self.sorted = self.angles[self.order]
+
+    def __len__(self):
+        return self.angles.size
+
+    def in_range(self, start, stop):
+        """Indices of the projections with start <= angle <= stop"""
+        lo = np.searchsorted(self.sorted, start, side="left")
+        hi = np.searchsorted(self.sorted, stop, side="right")
+        return np.sort(self.order[lo:max(lo, hi)])
+
+    def nearest(self, angles):
+        """Index of the projection nearest to each of the given angles (same shape as angles)"""
+        angles = np.asarray(angles, dtype=np.float64)
+        if self.sorted.size == 0:
+            raise ValueError("There are no projections")
+        right = np.clip(np.searchsorted(self.sorted, angles), 1, self.sorted.size-1) \
+                if self.sorted.size > 1 else np.zeros(angles.shape, dtype=int)
+        left = np.maximum(right-1, 0)
+        closer = np.abs(self.sorted[left]-angles) <= np.abs(self.sorted[right]-angles)
+        return self.order[np.where(closer, left, right)]
+
+    def subset(self, k, start=None, stop=None):
+        """
+        Indices of k projections (or less if there are not enough) nearest to k uniformly spaced angles
+        between start and stop, defaults to the whole angle range
+        """
+        candidates = self.in_range(-np.inf if start is None else start, np.inf if stop is None else stop)
+        if k >= candidates.size:
+            return candidates
+        index = Angle_Index(self.angles[candidates])
+        targets = np.linspace(index.sorted[0], index.sorted[-1], k)
+        chosen = np.unique(index.nearest(targets))
+        if chosen.size < k:
+            # Neighbouring targets hit the same projection, fill up with the ones farthest from the chosen
+            rest = np.setdiff1d(np.arange(candidates.size), chosen)
+            while chosen.size < k:
+                gaps = np.min(np.abs(index.angles[rest][:, None]-index.angles[chosen][None, :]), axis=1)
+                chosen = np.append(chosen, rest[np.argmax(gaps)])
+                rest = np.setdiff1d(rest, chosen)
+        return np.sort(candidates[chosen])
+
+###################################################################################################
+
 class TXRM_array:
     """
     This class does just read images and angles but does not load the whole imagedata into memory.
     You can slice the array to get special image indices as well as the angles.
     It holds the file handle!
-    To get other data use read_stream and handle the bytes yourself
+    To get other data use read_stream and handle the bytes yourself.
+    With apply_shifts the images are shifted by the alignment shifts (Alignment/Y-Shifts, X-Shifts)
+    With native the file is mapped into memory and parsed without pythoncom (see CFB_File),
+    by default if pywin32 is not installed or BACKEND is "native".
+    The images are then readonly views of the file pages, nothing is copied until you write to them,
+    and they keep the mapping alive after the file is closed.
+    With memory_budget (bytes) the chunk size of iter_chunks/reduce follows from the budget (see plan_memory,
+    the plan is in memory_plan) and reading more images at once raises MemoryError.
     """
-    def __init__(self, file_path, normalize=False):
+    def __init__(self, file_path, normalize=False, apply_shifts=False, workers=None, native=None,
+                 memory_budget=None):
         self.file_path = file_path
         # self.img_shape = shape
         self.normalize = normalize
+        self.apply_shifts = apply_shifts
+        self.workers = workers
+        self.native = _native() if native is None else native
         # Open File
-        self.MODUS = STGM_READWRITE|STGM_SHARE_EXCLUSIVE
-        self.ifile = pythoncom.StgOpenStorageEx(file_path, self.MODUS, STGFMT_STORAGE, 0,
-                                                pythoncom.IID_IStorage)
+        if self.native:
+            self.ifile = CFB_File(file_path)
+        else:
+            self.MODUS = STGM_READWRITE|STGM_SHARE_EXCLUSIVE
+            self.ifile = _com().StgOpenStorageEx(file_path, self.MODUS, STGFMT_STORAGE, 0,
+                                                 pythoncom.IID_IStorage)
         self.num_of_images = int.from_bytes(self.read_stream("ImageInfo/NoOfImages"), "little")
-        if normalize:
-            self.ref = np.frombuffer(self.read_stream(f"ReferenceData/Image"), dtype=float32).reshape(self.img_shape)
         
         width = int.from_bytes(self.read_stream("ImageInfo/ImageWidth"), "little")
         height = int.from_bytes(self.read_stream("ImageInfo/ImageHeight"), "little")
         self.img_shape = (height, width)
         data_type = int.from_bytes(self.read_stream("ImageInfo/DataType"), "little")
         self.img_dtype = np.float32 if data_type == 10 else np.uint16
+        if normalize:
+            # Copies, views would keep the map of a native file alive after close
+            self.ref = np.frombuffer(self.read_stream(f"ReferenceData/Image"), dtype=float32).reshape(self.img_shape).copy()
+        if apply_shifts:
+            self.shifts = (np.frombuffer(self.read_stream("Alignment/Y-Shifts"), float32).copy(),
+                           np.frombuffer(self.read_stream("Alignment/X-Shifts"), float32).copy())
+            if any(s.size != self.num_of_images for s in self.shifts):
+                raise ValueError("The file has no alignment shifts for every image")
+        self.__stack = self.__stack_view() if self.native else None
+        self.__angles = None
+        self.__angle_index = None
+        self.memory_plan = None
+        if memory_budget is not None:
+            self.memory_plan = plan_memory(self.num_of_images, self.img_shape, self.img_dtype, memory_budget,
+                                           normalize, apply_shifts, workers, eager=False,
+                                           mapped=self.__stack is not None)
+            _report_memory(file_path, self.memory_plan)
 
     def __enter__(self):  # Neccessary for contextmanager
         return self
     
     def __exit__(self, type, value, traceback):  # Neccessary for contextmanager
-        del self.ifile
+        self.close()
 
     def __del__(self):  # Remove ifile from scope
         if hasattr(self, "ifile"):
-            del self.ifile
+            self.close()
+
+    def close(self):
+        if self.native:
+            # Drop the own view first, the map is then unmapped unless callers hold views of it
+            self.__stack = None
+            self.ifile.close()
+        del self.ifile
+
+    def layout(self):
+        """
+        Returns (file offset of the first image, bytes from one image to the next) if every image lies
+        in consecutive sectors and they are evenly spaced, otherwise None. Just with native
+        """
+        if not self.native:
+            return None
+        nbytes = int(np.prod(self.img_shape))*np.dtype(self.img_dtype).itemsize
+        if self.num_of_images == 0 or nbytes == 0:
+            return None
+        offsets = []
+        for idx in range(self.num_of_images):
+            runs = self.ifile.runs(f"ImageData{(idx+100)//100}/Image{idx+1}")
+            if len(runs) != 1 or runs[0][1] != nbytes:
+                return None
+            offsets.append(runs[0][0])
+        steps = np.diff(offsets)
+        if steps.size and (np.any(steps != steps[0]) or steps[0] < nbytes):
+            return None
+        return offsets[0], int(steps[0]) if steps.size else nbytes
+
+    def __stack_view(self):
+        """Returns all images as one readonly (N, height, width) view of the mapped file, None if not possible"""
+        layout = self.layout()
+        if layout is None:
+            return None
+        offset, step = layout
+        nbytes = int(np.prod(self.img_shape))*np.dtype(self.img_dtype).itemsize
+        itemsize = np.dtype(self.img_dtype).itemsize
+        # frombuffer holds an export of the map, so it can not be unmapped below the views
+        flat = np.frombuffer(self.ifile.data, dtype=self.img_dtype, offset=offset,
+                             count=(step*(self.num_of_images-1)+nbytes)//itemsize)
+        return np.lib.stride_tricks.as_strided(flat, shape=(self.num_of_images, *self.img_shape),
+                                               strides=(step, self.img_shape[1]*itemsize, itemsize),
+                                               writeable=False)
     
+    @_profiled("read_stream")
     def read_stream(self, stream)->bytes:
+        if self.native:
+            # memoryview of the mapped file if the stream is not fragmented
+            return self.ifile.view(stream)
         stream = stream.split("/")
         stream_path = stream[:-1]
         stream = stream[-1]
         istorages = [self.ifile]
         for path in stream_path:
             try:
+                _count("storage_open")
                 istorages.append(istorages[-1].OpenStorage(path, None, self.MODUS, None))
             except:
                 return b""
@@ -290,18 +1091,54 @@ class TXRM_array:
         except:
             return b""
 
+    def stream_size(self, stream):
+        """Returns the size of a stream in bytes without reading it, -1 if it does not exist"""
+        if self.native:
+            return self.ifile.size(stream) if self.ifile.exists(stream) else -1
+        *stream_path, stream = stream.split("/")
+        istorage = self.ifile
+        try:
+            for path in stream_path:
+                istorage = istorage.OpenStorage(path, None, self.MODUS, None)
+            return int(istorage.OpenStream(stream, None, self.MODUS, 0).Stat()[2])
+        except:
+            return -1
+
     def __getitem__(self, val):
+        other = []
         if type(val)==tuple and isinstance(val[0], (int, tuple, slice, list, np.ndarray)):
             val, *other = val
         idx = np.arange(self.num_of_images)[val]
 
-        if isinstance(idx, (int, np.int64, np.int32)):
-            return np.frombuffer(self.read_stream(f"ImageData{int(np.ceil((idx+1)/100))}/Image{idx+1}"), dtype=self.img_dtype).reshape(self.img_shape)
-        out = np.empty((idx.size, *self.img_shape), dtype=self.img_dtype)
-        for i,j in enumerate(idx):
-            out[i] = np.frombuffer(self.read_stream(f"ImageData{int(np.ceil((j+1)/100))}/Image{j+1}"), dtype=self.img_dtype).reshape(self.img_shape)
-        
-        return (out/self.ref) if self.normalize else out
+        views = self.__stack is not None and not self.normalize and not self.apply_shifts
+        if self.memory_plan is not None and np.size(idx) > self.memory_plan["chunk"] and not (
+                views and isinstance(val, slice)):
+            raise MemoryError(f"{np.size(idx)} images exceed the memory budget, read at most "
+                              f"{self.memory_plan['chunk']} at once (iter_chunks)")
+        if views:
+            # Slices are views of the mapped file, index lists are copied by numpy
+            out = self.__stack[val]
+            return out[tuple(other)] if np.ndim(idx) == 0 else out[(slice(None), *other)]
+        if isinstance(idx, (int, np.int64, np.int32)) and not self.apply_shifts:
+            img = self.read_image(idx)
+            img = (img/self.ref) if self.normalize else img
+            return img[tuple(other)]
+        single = np.ndim(idx) == 0
+        idx = np.atleast_1d(idx)
+        if self.normalize:
+            # Normalize before shifting, the reference belongs to the unshifted detector
+            out = np.empty((idx.size, *self.img_shape), dtype=float32)
+            read_image = lambda j: self.read_image(j)/self.ref
+        else:
+            out = np.empty((idx.size, *self.img_shape), dtype=self.img_dtype)
+            read_image = self.read_image
+        _read_images(read_image, idx, out, self.shifts if self.apply_shifts else None, self.workers)
+        return out[0][tuple(other)] if single else out[(slice(None), *other)]
+
+    def read_image(self, idx):
+        """Returns image idx (0-based) as it is stored"""
+        return np.frombuffer(self.read_stream(f"ImageData{(idx+100)//100}/Image{idx+1}"),
+                             dtype=self.img_dtype).reshape(self.img_shape)
     
     def __len__(self):
         return self.num_of_images
@@ -315,22 +1152,540 @@ class TXRM_array:
 
     @property
     def angles(self):
+        # Read once, the file can not change while it is open
+        if self.__angles is None:
+            self.__angles = np.frombuffer(self.read_stream("ImageInfo/Angles"), float32).copy()
+            # Readonly, the cache and angle_index can not be changed by callers
+            self.__angles.flags.writeable = False
         if ANGLE_UNIT=="rad":
-            return np.deg2rad(np.frombuffer(self.read_stream("ImageInfo/Angles"), float32))
+            return np.deg2rad(self.__angles)
         else:
-            return np.frombuffer(self.read_stream("ImageInfo/Angles"), float32)
+            return self.__angles
+
+    @property
+    def angle_index(self):
+        """Angle_Index of the projection angles (in ANGLE_UNIT), e.g. arr[arr.angle_index.in_range(-30, 30)]"""
+        if self.__angle_index is None or self.__angle_index[0] != ANGLE_UNIT:
+            self.__angle_index = (ANGLE_UNIT, Angle_Index(self.angles))
+        return self.__angle_index[1]
+
+    def iter_chunks(self, chunk=None, indices=None):
+        """
+        Yields (indices, images) of chunk images at once, just one chunk is in memory.
+        chunk defaults to the chunk of the memory plan or 32
+        """
+        chunk = _default_chunk(self, chunk)
+        everything = indices is None
+        indices = np.arange(self.num_of_images) if everything else np.asarray(indices)
+        for start in range(0, indices.size, chunk):
+            idx = indices[start:start+chunk]
+            # Slices stay views with native
+            yield idx, self[start:start+chunk] if everything else self[idx]
+
+    def reduce(self, chunk=None, workers=None, bins=None, hist_range=None, dead_value=0, hot_value=None):
+        """
+        Computes statistics of all images in one pass with bounded memory (about (workers+2)*chunk images).
+        The next chunk is read while workers reduce the previous ones, every worker converts a quarter
+        of its chunk at a time to float64.
+        Returns a dict with the per projection arrays mean, std, min, max, the global values
+        global_mean, global_min, global_max and the maps dead_pixels/hot_pixels
+        (pixels equal dead_value / >= hot_value in all images, hot_value defaults to the max of uint16).
+        With bins also histogram and hist_edges, hist_range is needed for float images
+        """
+        workers = os.cpu_count() if workers is None else workers
+        # Chunks in flight and the float64 blocks (a quarter chunk) of the workers
+        chunk = _default_chunk(self, chunk, workers+3+workers//4)
+        float_data = self.normalize or self.img_dtype == np.float32
+        if hot_value is None and not float_data:
+            hot_value = np.iinfo(self.img_dtype).max
+        edges = None
+        if bins is not None:
+            if hist_range is None and float_data:
+                raise ValueError("hist_range is needed for the histogram of float images")
+            hist_range = (0, np.iinfo(self.img_dtype).max+1) if hist_range is None else hist_range
+            edges = np.linspace(hist_range[0], hist_range[1], bins+1)
+
+        def reduce_chunk(images):
+            flat = images.reshape(images.shape[0], -1)
+            pixels = flat.shape[1]
+            # Sums of the differences to the first pixel (stable variance) in column blocks,
+            # so the float64 copy is a quarter of the chunk
+            first = flat[:, :1].astype(np.float64)
+            total = np.zeros(flat.shape[0])
+            squares = np.zeros(flat.shape[0])
+            dead = np.empty(pixels, dtype=bool)
+            hot = np.empty(pixels, dtype=bool) if hot_value is not None else None
+            hist = np.zeros(len(edges)-1, dtype=np.int64) if edges is not None else None
+            step = max(1, pixels*flat.itemsize//32)
+            for start in range(0, pixels, step):
+                part = flat[:, start:start+step]
+                values = part - first
+                total += values.sum(axis=1)
+                squares += np.square(values, out=values).sum(axis=1)
+                dead[start:start+step] = np.all(part == dead_value, axis=0)
+                if hot is not None:
+                    hot[start:start+step] = np.all(part >= hot_value, axis=0)
+                if hist is not None:
+                    hist += np.histogram(part, bins=edges)[0]
+            shift = total/max(pixels, 1)
+            result = {
+                "mean": first[:, 0] + shift,
+                "std": np.sqrt(np.maximum(squares/max(pixels, 1) - shift**2, 0)),
+                "min": flat.min(axis=1),
+                "max": flat.max(axis=1),
+                "dead": dead.reshape(images.shape[1:]),
+                "hot": hot.reshape(images.shape[1:]) if hot is not None else None,
+            }
+            if hist is not None:
+                result["hist"] = hist
+            return result
+
+        # The pixel maps and the histogram are combined as the chunks finish, just the
+        # per projection values are kept
+        results = {key: [] for key in ["mean", "std", "min", "max"]}
+        combined = dict(dead=None, hot=None, hist=None)
+        def collect(result):
+            for key in results:
+                results[key].append(result[key])
+            for key, combine in [("dead", np.logical_and), ("hot", np.logical_and), ("hist", np.add)]:
+                if result.get(key) is not None:
+                    combined[key] = result[key] if combined[key] is None else \
+                                    combine(combined[key], result[key], out=combined[key])
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for _, images in self.iter_chunks(chunk):
+                pending.append(pool.submit(reduce_chunk, images))
+                while len(pending) > workers:
+                    collect(pending.popleft().result())
+            while pending:
+                collect(pending.popleft().result())
+
+        out = {key: np.concatenate(values) if values else np.zeros(0) for key, values in results.items()}
+        out["global_mean"] = float(np.sum(out["mean"]))/max(out["mean"].size, 1)
+        out["global_min"] = out["min"].min() if out["min"].size else None
+        out["global_max"] = out["max"].max() if out["max"].size else None
+        out["dead_pixels"] = combined["dead"]
+        out["hot_pixels"] = combined["hot"]
+        if edges is not None:
+            out["histogram"] = combined["hist"]
+            out["hist_edges"] = edges
+        return out
+
+###################################################################################################
+
+class TXRM_Stack:
+    """
+    Several files as one virtual (N_total, height, width) projection stack, e.g. of long or tiled acquisitions.
+    Reads are passed on to the TXRM_array of each file, nothing is loaded or concatenated in memory.
+    All files need the same image size and data type. It holds the file handles!
+    write materialises the stack into one file image by image
+    """
+    def __init__(self, file_paths, normalize=False, apply_shifts=False, workers=None, native=None):
+        self.file_paths = list(file_paths)
+        if not self.file_paths:
+            raise ValueError("No files given")
+        self.normalize = normalize
+        self.arrays = []
+        try:
+            for path in self.file_paths:
+                self.arrays.append(TXRM_array(path, normalize, apply_shifts, workers, native))
+        except:
+            self.close()
+            raise
+        first = self.arrays[0]
+        for path, arr in zip(self.file_paths, self.arrays):
+            if arr.img_shape != first.img_shape or arr.img_dtype != first.img_dtype:
+                self.close()
+                raise ValueError(f"{path} has images of {arr.img_shape} {np.dtype(arr.img_dtype).name}, "
+                                 f"not {first.img_shape} {np.dtype(first.img_dtype).name}")
+        self.img_shape = first.img_shape
+        self.img_dtype = first.img_dtype
+        # Index of the first image of every file in the stack
+        self.offsets = np.cumsum([0] + [len(arr) for arr in self.arrays])
+        self.num_of_images = int(self.offsets[-1])
+        self.__angle_index = None
+
+    def __enter__(self):  # Neccessary for contextmanager
+        return self
+
+    def __exit__(self, type, value, traceback):  # Neccessary for contextmanager
+        self.close()
+
+    def close(self):
+        for arr in self.arrays:
+            if hasattr(arr, "ifile"):
+                arr.close()
+
+    def locate(self, indices):
+        """Returns (file number, image index in the file) of stack indices"""
+        indices = np.asarray(indices)
+        files = np.searchsorted(self.offsets, indices, side="right") - 1
+        return files, indices - self.offsets[files]
+
+    def __getitem__(self, val):
+        other = []
+        if type(val)==tuple and isinstance(val[0], (int, tuple, slice, list, np.ndarray)):
+            val, *other = val
+        idx = np.arange(self.num_of_images)[val]
+        files, local = self.locate(idx)
+        if np.ndim(idx) == 0:
+            return self.arrays[int(files)][(int(local), *other)]
+        if idx.size and np.all(files == files[0]):
+            steps = np.diff(local)
+            if steps.size == 0 or (steps[0] > 0 and np.all(steps == steps[0])):
+                # All in one file: pass the slice on, native stacks stay views
+                step = int(steps[0]) if steps.size else 1
+                return self.arrays[int(files[0])][(slice(int(local[0]), int(local[-1])+1, step), *other)]
+        shape = np.empty(self.img_shape, dtype=bool)[tuple(other)].shape
+        out = np.empty((idx.size, *shape), dtype=float32 if self.normalize else self.img_dtype)
+        for f in np.unique(files):
+            mask = files == f
+            out[mask] = self.arrays[f][(local[mask], *other)]
+        return out
+
+    def __len__(self):
+        return self.num_of_images
+
+    @property
+    def size(self):
+        return self.num_of_images
+
+    def shape(self):
+        return (self.num_of_images, *self.img_shape)
+
+    @property
+    def angles(self):
+        return np.concatenate([arr.angles for arr in self.arrays])
+
+    @property
+    def angle_index(self):
+        """Angle_Index of the merged angles (in ANGLE_UNIT)"""
+        if self.__angle_index is None or self.__angle_index[0] != ANGLE_UNIT:
+            self.__angle_index = (ANGLE_UNIT, Angle_Index(self.angles))
+        return self.__angle_index[1]
+
+    iter_chunks = TXRM_array.iter_chunks
+    reduce = TXRM_array.reduce
+
+    def write(self, file_path):
+        """
+        Writes the stack into one new file, one image is in memory at once.
+        The first file is the template: its images stay and the images of the other files are appended,
+        the per image streams (angles, positions, shifts, dates, motors, other arrays) are concatenated
+        and the number of images is updated, every other stream is taken from the first file.
+        The stored images are written, without normalize or shifts
+        """
+        if os.path.abspath(file_path) in [os.path.abspath(p) for p in self.file_paths]:
+            raise ValueError("The stack can not be written into one of its files")
+        first = self.arrays[0]
+        if first.native:
+            shutil.copy(self.file_paths[0], file_path)
+        else:
+            # The file is opened exclusively, so it is copied by its handle
+            istorage = _com().StgCreateStorageEx(file_path, STGM_READWRITE|STGM_SHARE_EXCLUSIVE|STGM_CREATE,
+                                                 STGFMT_STORAGE, 0, pythoncom.IID_IStorage)
+            first.ifile.CopyTo(None, None, istorage)
+            istorage.Commit(0)
+            del istorage
+        try:
+            with OLE_Base(file_path, "w") as ole:
+                k = len(self.arrays[0])
+                for arr in self.arrays[1:]:
+                    for j in range(len(arr)):
+                        k += 1
+                        data = arr.read_stream(f"ImageData{(j+100)//100}/Image{j+1}")
+                        ole.write_stream(f"ImageData{(k+99)//100}/Image{k}", bytes(data))
+                # Per image streams of the schema, the big records and the other arrays (as TXRM_IO finds them)
+                per_image = [path for entry in META_SCHEMA.values() if entry["shape"] == "images"
+                             for path in entry["paths"]]
+                per_image += ["ImageInfo/Dates", "PositionInfo/MotorPositions", "PositionInfo/RawMotorPositions",
+                              "PositionInfo/MotorPositionsIdeal"]
+                known = [p.lower() for entry in META_SCHEMA.values() for p in entry["paths"]]
+                for path in ole.streams:
+                    if path.startswith("ImageData") or path.lower() in known or path in per_image:
+                        continue
+                    if all(arr.stream_size(path) == 4*len(arr) for arr in self.arrays):
+                        per_image.append(path)
+                for path in per_image:
+                    sizes = [arr.stream_size(path) for arr in self.arrays]
+                    if sizes[0] <= 0:
+                        continue  # Not in the template
+                    # Every file needs the same record size per image, else the merged stream is inconsistent
+                    record = sizes[0]/max(len(first), 1)
+                    for arr, size in zip(self.arrays, sizes):
+                        if size < 0:
+                            raise ValueError(f"{path} is missing in {arr.file_path}")
+                        if size != record*len(arr):
+                            raise ValueError(f"{path} of {arr.file_path} has {size} bytes, "
+                                             f"{int(record*len(arr))} are needed for its images")
+                    ole.write_stream(path, b"".join(bytes(arr.read_stream(path)) for arr in self.arrays))
+                count = encode_meta(self.num_of_images, META_SCHEMA["number_of_images"])
+                for path in META_SCHEMA["number_of_images"]["paths"]:
+                    if ole.exists(path):
+                        ole.write_stream(path, count)
+        except:
+            os.remove(file_path)
+            raise
+        return file_path
+
+###################################################################################################
+
+class TXM_Volume(TXRM_array):
+    """
+    Lazy (Z, Y, X) access to reconstructed volumes (.txm), every slice is stored like a projection.
+    Slicing works like TXRM_array, e.g. vol[100:110] (slab) or vol[50, 200:400, 300:500] (ROI).
+    xz and yz extract orthogonal planes, just the needed rows of the slices are read. It holds the file handle!
+    """
+    def __init__(self, file_path, workers=None, native=None):
+        super().__init__(file_path, workers=workers, native=native)
+        pixel_size = np.frombuffer(self.read_stream("ImageInfo/PixelSize"), float32)
+        # Voxel size in um (z, y, x), the slices are as thick as their pixels are wide
+        self.voxel_size = (float(pixel_size[0]),)*3 if pixel_size.size else None
+
+    def __read_range(self, z, start, length):
+        """Reads length bytes from start of slice z"""
+        if self.native:
+            return self.ifile.view(f"ImageData{(z+100)//100}/Image{z+1}")[start:start+length]
+        istorage = self.ifile.OpenStorage(f"ImageData{(z+100)//100}", None, self.MODUS, None)
+        istream = istorage.OpenStream(f"Image{z+1}", None, self.MODUS, 0)
+        istream.Seek(start, 0)
+        return istream.Read(length)
+
+    def rows(self, z=None, y=None):
+        """
+        Returns the rows y (index or slice, default all) of the slices z (index, slice or list, default all)
+        as (len(z), len(y), X) array. Just the bytes of these rows are read
+        """
+        z_idx = np.atleast_1d(np.arange(self.num_of_images)[slice(None) if z is None else z])
+        # Negative indices count from the last row
+        y_range = range(self.img_shape[0])[slice(None) if y is None else y]
+        if isinstance(y_range, int):
+            y_range = range(y_range, y_range+1)
+        y0, y1 = (min(y_range), max(y_range)+1) if len(y_range) else (0, 0)
+        row_bytes = self.img_shape[1]*np.dtype(self.img_dtype).itemsize
+        out = np.empty((z_idx.size, y1-y0, self.img_shape[1]), dtype=self.img_dtype)
+        for i, k in enumerate(z_idx):
+            data = self.__read_range(int(k), y0*row_bytes, (y1-y0)*row_bytes)
+            out[i] = np.frombuffer(data, dtype=self.img_dtype).reshape(y1-y0, self.img_shape[1])
+        return out[:, ::y_range.step]
+
+    def xz(self, y, z=None, x=None):
+        """Returns the XZ plane at row y as (Z, X) array, one row of every slice is read"""
+        y = range(self.img_shape[0])[y]
+        return self.rows(z, slice(y, y+1))[:, 0, slice(None) if x is None else x]
+
+    def yz(self, x, z=None, y=None):
+        """Returns the YZ plane at column x as (Z, Y) array, the rows y (slice) of every slice are read"""
+        z_idx = np.atleast_1d(np.arange(self.num_of_images)[slice(None) if z is None else z])
+        height = len(range(*(slice(None) if y is None else y).indices(self.img_shape[0])))
+        out = np.empty((z_idx.size, height), dtype=self.img_dtype)
+        # Slice by slice, so just the rows of one slice are in memory
+        for i, k in enumerate(z_idx):
+            out[i] = self.rows(int(k), y)[0, :, x]
+        return out
+
+###################################################################################################
+
+# Schema of the known metadata streams
+#   paths: Storage/Stream paths of the entry, the first one is read, all are written
+#   dtype: uint16, uint32, float32, ... or bytes for plain strings
+#   shape: "scalar" (single value), "images" (one value per projection) or a fixed tuple
+#   unit:  Unit of the stored values, None if unitless
+#   const: Arrays which are treated as constant and padded on save (not part of meta)
+META_SCHEMA = {
+    "image_width": {"paths": ["ImageInfo/ImageWidth"], "dtype": uint32, "shape": "scalar", "unit": "px"},
+    "image_height": {"paths": ["ImageInfo/ImageHeight"], "dtype": uint32, "shape": "scalar", "unit": "px"},
+    "image_data_type": {"paths": ["ImageInfo/DataType"], "dtype": uint32, "shape": "scalar", "unit": None},
+    "number_of_images": {"paths": ["ImageInfo/NoOfImages",
+                                   "AcquisitionSettings/TotalImages",
+                                   "ImageInfo/ImagesTaken",
+                                   "PositionInfo/NoOfImages",
+                                   "TemperatureInfo/NoOfImages",
+                                   "ThermalHistoryInfo/NoOfImages"],
+                         "dtype": uint32, "shape": "scalar", "unit": None},
+    "pixel_size": {"paths": ["ImageInfo/PixelSize"], "dtype": float32, "shape": "scalar", "unit": "um"},
+    "cam_pixel_size": {"paths": ["ImageInfo/CamPixelSize"], "dtype": float32, "shape": "scalar", "unit": "um"},
+    "optical_magnification": {"paths": ["ImageInfo/OpticalMagnification"], "dtype": float32, "shape": "scalar",
+                              "unit": None},
+    "binning": {"paths": ["ImageInfo/CameraBinning"], "dtype": uint32, "shape": "scalar", "unit": None},
+    "reference_filename": {"paths": ["ImageInfo/ReferenceFile"], "dtype": bytes, "shape": "scalar", "unit": None},
+    "reference_data_type": {"paths": ["referencedata/DataType"], "dtype": uint32, "shape": "scalar", "unit": None},
+    "angles": {"paths": ["ImageInfo/Angles"], "dtype": float32, "shape": "images", "unit": "degree"},
+    "x_positions": {"paths": ["ImageInfo/XPosition"], "dtype": float32, "shape": "images", "unit": "um"},
+    "y_positions": {"paths": ["ImageInfo/YPosition"], "dtype": float32, "shape": "images", "unit": "um"},
+    "z_positions": {"paths": ["ImageInfo/ZPosition"], "dtype": float32, "shape": "images", "unit": "um"},
+    "x_shifts": {"paths": ["Alignment/X-Shifts"], "dtype": float32, "shape": "images", "unit": "px"},
+    "y_shifts": {"paths": ["Alignment/Y-Shifts"], "dtype": float32, "shape": "images", "unit": "px"},
+    "detector_distance": {"paths": ["ImageInfo/DtoRADistance"], "dtype": float32, "shape": "images", "unit": "mm",
+                          "const": True},
+    "source_distance": {"paths": ["ImageInfo/StoRADistance"], "dtype": float32, "shape": "images", "unit": "mm",
+                        "const": True},
+}
+
+def register_meta(name, paths, dtype, shape="scalar", unit=None, const=False):
+    """
+    Adds an entry to META_SCHEMA, every TXRM_IO opened afterwards reads and writes it
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    META_SCHEMA[name] = {"paths": list(paths), "dtype": dtype, "shape": shape, "unit": unit, "const": const}
+
+def schema_for_path(path, schema=None):
+    """Returns (name, entry) of the schema entry containing path or (None, None)"""
+    schema = META_SCHEMA if schema is None else schema
+    for name, entry in schema.items():
+        if any(p.lower() == path.lower() for p in entry["paths"]):
+            return name, entry
+    return None, None
+
+def _shape_value(value, shape):
+    if shape == "scalar":
+        return value[0] if value.size == 1 else value
+    if isinstance(shape, tuple) and value.size == int(np.prod(shape)):
+        return value.reshape(shape)
+    return value
+
+def decode_meta(raw, schema=None):
+    """
+    Decodes the raw bytes (dict of path: bytes) of all schema entries.
+    All entries sharing a dtype are converted in one go and split afterwards
+    """
+    schema = META_SCHEMA if schema is None else schema
+    values = dict()
+    groups = dict()
+    for name, entry in schema.items():
+        data = raw.get(entry["paths"][0], b"")
+        if entry["dtype"] in (bytes, str):
+            values[name] = data
+            continue
+        dtype = np.dtype(entry["dtype"])
+        groups.setdefault(dtype, []).append((name, data[:len(data)//dtype.itemsize*dtype.itemsize]))
+    for dtype, entries in groups.items():
+        flat = np.frombuffer(b"".join(data for _, data in entries), dtype=dtype)
+        bounds = np.cumsum([len(data)//dtype.itemsize for _, data in entries])[:-1]
+        for (name, _), value in zip(entries, np.split(flat, bounds)):
+            values[name] = _shape_value(value, schema[name]["shape"])
+    return values
+
+def encode_meta(value, entry):
+    """Converts a value to the bytes of the stream with the dtype of the schema entry"""
+    if entry["dtype"] in (bytes, str):
+        return value.encode() if isinstance(value, str) else bytes(value)
+    return np.asarray(value, dtype=entry["dtype"]).tobytes()
+
+###################################################################################################
+
+# Records of the "big" streams (dates, axis names, units) are 40 bytes each
+BIG_RECORD_SIZE = 40
+# Date records: "MM/DD/YYYY HH:MM:SS.fff" + 13 \x00 + \xb5 + 3 \x00
+_DATE_LENGTH = 23
+_DATE_TAIL = b"\x00"*13 + b"\xb5" + b"\x00"*3
+# Byte positions to reorder "MM/DD/YYYY HH:MM:SS.fff" <-> "YYYY-MM-DDTHH:MM:SS.fff"
+_DATE_TO_ISO = np.array([6, 7, 8, 9, 2, 0, 1, 5, 3, 4, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22])
+_ISO_TO_DATE = np.argsort(_DATE_TO_ISO)
+
+
+def decode_names(raw, record_size=BIG_RECORD_SIZE):
+    """
+    Decodes a stream of fixed size records to an array of strings (bytes),
+    everything after the first \\x00 of a record is dropped
+    """
+    records = np.frombuffer(raw, dtype=np.uint8, count=len(raw)//record_size*record_size)
+    records = records.reshape(-1, record_size).copy()
+    records[np.cumsum(records == 0, axis=1) > 0] = 0
+    return records.view(f"S{record_size}").ravel()
+
+def encode_names(names, record_size=BIG_RECORD_SIZE):
+    """Encodes strings/bytes to a stream of fixed size records padded with \\x00"""
+    names = np.char.encode(names) if np.asarray(names).dtype.kind == "U" else np.asarray(names, dtype=bytes)
+    return names.astype(f"S{record_size}").tobytes()
+
+def decode_dates(raw):
+    """
+    Decodes the date records of ImageInfo/Dates at once to datetime64[ms], dates without
+    (or with fewer digits of) fractions of seconds are padded with zeros.
+    Returns the plain date strings (decode_names) instead if the format is unknown, any record can not
+    be parsed or __AUTO_FORMAT_DATES is False
+    """
+    records = np.frombuffer(raw, dtype=np.uint8, count=len(raw)//BIG_RECORD_SIZE*BIG_RECORD_SIZE)
+    records = records.reshape(-1, BIG_RECORD_SIZE)
+    text = records[:, :_DATE_LENGTH]
+    if not __AUTO_FORMAT_DATES or text.size == 0 or not (
+        np.all(text[:, 2] == ord("/")) and np.all(text[:, 5] == ord("/"))):
+        return decode_names(raw)
+    iso = text[:, _DATE_TO_ISO].copy()
+    iso[:, 4] = iso[:, 7] = ord("-")
+    iso[:, 10] = ord("T")
+    iso[iso[:, 19] == 0, 19] = ord(".")  # No fraction of seconds
+    iso[iso == 0] = ord("0")  # Missing digits of the fraction
+    try:
+        with warnings.catch_warnings():
+            # numpy warns about trailing text instead of failing
+            warnings.simplefilter("error")
+            return iso.view(f"S{_DATE_LENGTH}").ravel().astype("datetime64[ms]")
+    except (ValueError, UserWarning):
+        return decode_names(raw)
+
+def encode_dates(dates, template=b""):
+    """
+    Encodes datetime64 (or already formatted date strings) to the records of ImageInfo/Dates.
+    The last 17 bytes of every record are taken from template if it has enough records
+    """
+    dates = np.asarray(dates)
+    records = np.zeros((dates.size, BIG_RECORD_SIZE), dtype=np.uint8)
+    if dates.dtype.kind == "M":
+        iso = np.datetime_as_string(dates.astype("datetime64[ms]"), unit="ms").astype(f"S{_DATE_LENGTH}")
+        text = iso.view(np.uint8).reshape(-1, _DATE_LENGTH)[:, _ISO_TO_DATE]
+        text[:, 2] = text[:, 5] = ord("/")
+        text[:, 10] = ord(" ")
+        records[:, :_DATE_LENGTH] = text
+    else:
+        text = dates.astype(f"S{_DATE_LENGTH}")
+        records[:, :_DATE_LENGTH] = text.view(np.uint8).reshape(-1, _DATE_LENGTH)
+    if len(template) >= records.size:
+        old = np.frombuffer(template, dtype=np.uint8, count=records.size).reshape(-1, BIG_RECORD_SIZE)
+        records[:, _DATE_LENGTH:] = old[:, _DATE_LENGTH:]
+    else:
+        records[:, _DATE_LENGTH:] = np.frombuffer(_DATE_TAIL, dtype=np.uint8)
+    return records.tobytes()
+
+def read_meta(file_path, schema=None):
+    """
+    Reads just the meta data of the schema and the dates of a file, no image is touched.
+    The file is opened readonly and can be read by several processes at once
+    """
+    schema = META_SCHEMA if schema is None else schema
+    paths = [entry["paths"][0] for entry in schema.values()]
+    with OLE_Base(file_path, "r") as ole:
+        raw = ole.read_streams(paths + ["ImageInfo/Dates"])
+    meta = decode_meta(raw, schema)
+    meta["dates"] = decode_dates(raw["ImageInfo/Dates"])
+    return meta
 
 ###################################################################################################
 
 class TXRM_IO(OLE_Base):
-    def __init__(self, file_path, mode="r", overwrite=False):
-        self.MODUS = STGM_READWRITE|STGM_SHARE_EXCLUSIVE
-        if not file_path.lower().endswith(".txrm"):
+    def __init__(self, file_path, mode="r", overwrite=False, apply_shifts=False, workers=None, transacted=None,
+                 memory_budget=None):
+        if not file_path.lower().endswith((".txrm", ".txm")):
             file_path = f"{file_path}.txrm"
+        # Lazy TXRM_array of the images if they do not fit into the memory budget, closed by close
+        self.__lazy = None
         
+        # In place saves are transacted by default, the original is untouched when editing a copy
+        super().__init__(file_path, mode, overwrite if transacted is None else transacted)
         self.__source_file = file_path
         self.__overwrite = overwrite
         self.__mode = "w" if mode.lower()=="w" else "r"
+        if apply_shifts and self.__mode == "w":
+            raise ValueError("Alignment shifts can just be applied in read mode")
+        # Shift the images by the alignment shifts while loading
+        self.__apply_shifts = apply_shifts
+        self.__workers = workers
+        # Bytes the images may take, in read mode they are read lazily if they do not fit (see plan_memory)
+        self.__memory_budget = memory_budget
+        self.__memory_plan = None
         
         
         self.__images = None
@@ -338,31 +1693,18 @@ class TXRM_IO(OLE_Base):
         self.__meta = dict()
         self.__const_array_data = dict()
         self.__default = dict()
+        self.__dates = None
+        self.__motors = None
+        self.__angle_index = None
+        # Stored image index (1-based, 0 for new images) and checksums of the stored images
+        self.__image_origin = np.zeros(0, dtype=int)
+        self.__image_crc = dict()
 
+        # Schema of the meta data, entries added with add_meta just live in this object
+        self.__schema = deepcopy(META_SCHEMA)
         # Dict with the Storage/Stream paths of the meta data
-        self.__meta_path = {
-            "image_width": ["ImageInfo/ImageWidth"],
-            "image_height": ["ImageInfo/ImageHeight"],
-            "image_data_type": ["ImageInfo/DataType"],  # This one has many same positions
-            "number_of_images": ["AcquisitionSettings/TotalImages",
-                                "ImageInfo/ImagesTaken",
-                                "ImageInfo/NoOfImages",
-                                "PositionInfo/NoOfImages",
-                                "TemperatureInfo/NoOfImages",
-                                "ThermalHistoryInfo/NoOfImages"],
-            "pixel_size": ["ImageInfo/PixelSize"],
-            "cam_pixel_size": ["ImageInfo/CamPixelSize"],
-            "optical_magnification": ["ImageInfo/OpticalMagnification"],
-            "binning": ["ImageInfo/CameraBinning"],
-            "reference_filename": ["ImageInfo/ReferenceFile"],
-            "reference_data_type": ["referencedata/DataType"],
-            "angles": ["ImageInfo/Angles"],
-            "x_positions": ["ImageInfo/XPosition"],
-            "y_positions": ["ImageInfo/YPosition"],
-            "z_positions": ["ImageInfo/ZPosition"],
-            "x_shifts": ["Alignment/X-Shifts"],
-            "y_shifts": ["Alignment/Y-Shifts"]
-        }
+        self.__meta_path = {name: list(entry["paths"]) for name, entry in self.__schema.items()
+                            if not entry.get("const")}
         # Dict with pathes of arrays with 40bytes per entry
         self.__big_path = {
             "dates": "ImageInfo/Dates",                     # 23 Bytes date + 13 \x00 + \xb5 + 3 \x00
@@ -379,9 +1721,11 @@ class TXRM_IO(OLE_Base):
 # PRIVATE
     def __enter__(self):  # Neccessary for contextmanager
         self.open()
-        self.__load_file()
+        with _phase("load"):
+            self.__load_file()
         if self.__mode == "w":
-            self.__load_array_data()
+            with _phase("array_discovery"):
+                self.__load_array_data()
         return self
 
     def __read_value(self, stream, dtype):
@@ -398,32 +1742,13 @@ class TXRM_IO(OLE_Base):
         """
         Load the neccessary meta_data from the file
         """
-        self.__const_array_data = {
-            "ImageInfo/DtoRADistance": self.__read_value("ImageInfo/DtoRADistance", float32), 
-            "ImageInfo/StoRADistance": self.__read_value("ImageInfo/StoRADistance", float32)
-        }
-        num_of_images = self.__read_value("ImageInfo/NoOfImages", uint32)
-
-        self.__meta = {
-            "reference_filename": self.__read_value("ImageInfo/ReferenceFile", bytes),
-            "reference_data_type": self.__read_value("referencedata/DataType", uint32),
-
-            "image_width": self.__read_value("ImageInfo/ImageWidth", uint32),
-            "image_height": self.__read_value("ImageInfo/ImageHeight", uint32),
-            "image_data_type": self.__read_value("ImageInfo/DataType", uint32),
-            "number_of_images": num_of_images,
-            "pixel_size": self.__read_value("ImageInfo/PixelSize", float32),
-            "cam_pixel_size": self.__read_value("ImageInfo/CamPixelSize", float32),
-            "optical_magnification": self.__read_value("ImageInfo/OpticalMagnification", float32),
-            "binning": self.__read_value("ImageInfo/CameraBinning", uint32),
-            "angles": self.__read_value("ImageInfo/Angles", float32),
-
-            "x_positions": self.__read_value("ImageInfo/XPosition", float32),
-            "y_positions": self.__read_value("ImageInfo/YPosition", float32),
-            "z_positions": self.__read_value("ImageInfo/ZPosition", float32),
-            "x_shifts": self.__read_value("Alignment/X-Shifts", float32),
-            "y_shifts": self.__read_value("Alignment/Y-Shifts", float32)
-        }
+        # Read and decode all schema entries in one pass
+        raw = self.read_streams([entry["paths"][0] for entry in self.__schema.values()])
+        values = decode_meta(raw, self.__schema)
+        self.__const_array_data = {entry["paths"][0]: values[name] for name, entry in self.__schema.items()
+                                   if entry.get("const")}
+        self.__meta = {name: values[name] for name in self.__meta_path}
+        num_of_images = self.__meta["number_of_images"]
         if self.__meta["reference_data_type"] == 10:
             ref_dtype = float32  # float16?
         elif self.__meta["reference_data_type"] == 5:
@@ -443,57 +1768,222 @@ class TXRM_IO(OLE_Base):
         
         self.__angles = self.__meta["angles"]
         shape = (self.__meta["image_height"], self.__meta["image_width"])
-        self.__images = np.empty(shape=(num_of_images, *shape), dtype=image_dtype)
-        for i in range(1, num_of_images+1):
-            data = self.read_stream(f"ImageData{(i+99)//100}/Image{i}")
-            self.__images[i-1] = np.frombuffer(data, dtype=image_dtype).reshape(shape)
+        eager = True
+        if self.__memory_budget is not None:
+            # Decide before the first image is read by the peak of loading all images
+            self.__memory_plan = plan_memory(num_of_images, shape, image_dtype, apply_shifts=self.__apply_shifts,
+                                             workers=self.__workers, writing=self.__mode == "w")
+            self.__memory_plan["memory_budget"] = self.__memory_budget
+            eager = self.__memory_plan["peak_bytes"] <= self.__memory_budget
+            if not eager and self.__mode == "w":
+                self.close()
+                if not self.__overwrite:
+                    # Nothing was edited yet, drop the copy made by open
+                    os.remove(self.file_path)
+                raise MemoryError(f"Editing {self.file_path} needs {self.__memory_plan['peak_bytes']} bytes, "
+                                  f"the memory budget is {self.__memory_budget} bytes. Read it with TXRM_array")
+        if eager:
+            self.__images = np.empty(shape=(num_of_images, *shape), dtype=image_dtype)
+            shifts = None
+            if self.__apply_shifts:
+                shifts = (self.__meta["y_shifts"], self.__meta["x_shifts"])
+                if any(np.size(s) != num_of_images for s in shifts):
+                    raise ValueError("The file has no alignment shifts for every image")
+            read_image = lambda i: np.frombuffer(self.read_stream(f"ImageData{(i+100)//100}/Image{i+1}"),
+                                                 dtype=image_dtype).reshape(shape)
+            _read_images(read_image, range(num_of_images), self.__images, shifts, self.__workers)
+            if self.__memory_plan is not None:
+                _report_memory(self.file_path, self.__memory_plan)
+        else:
+            # images is a TXRM_array of the mapped file, it plans the lazy access itself (mmap or chunked)
+            self.__lazy = TXRM_array(self.file_path, apply_shifts=self.__apply_shifts, workers=self.__workers,
+                                     native=True, memory_budget=self.__memory_budget)
+            self.__memory_plan = self.__lazy.memory_plan
+        self.__image_origin = np.arange(1, num_of_images+1)
         # Also get the reference image
         self.__reference = np.frombuffer(self.read_stream("ReferenceData/Image"),
                                         dtype=ref_dtype).reshape(shape)
+        self.__load_big()
         
     def __load_big(self):
         """
-        Load data saved in big_paths and restructure to a better format
+        Load data saved in big_paths and restructure to a better format.
+        Every stream is decoded at once, dates to datetime64 and motors to (num_of_images, axes) arrays
+        """
+        num_of_images = self.__meta["number_of_images"]
+        self.__raw_dates = self.__read_value(self.__big_path["dates"], bytes)
+        self.__dates = decode_dates(self.__raw_dates) if self.__raw_dates else None
+
+        axis_names = decode_names(self.__read_value(self.__big_path["axis_names"], bytes))
+        units = decode_names(self.__read_value(self.__big_path["units"], bytes))
+        self.__motors = dict(axis_names=axis_names, units=units)
+        for key in ["motor", "motor_raw", "motor_ideal"]:
+            values = self.__read_value(self.__big_path[key], float32)
+            values = np.atleast_1d(values)
+            if values.size == 0:
+                self.__motors[key] = None
+                continue
+            axes = axis_names.size if axis_names.size else max(values.size//max(num_of_images, 1), 1)
+            self.__motors[key] = values[:values.size//axes*axes].reshape(-1, axes)
+        if all(self.__motors[k] is None for k in ["motor", "motor_raw", "motor_ideal"]) and axis_names.size == 0:
+            self.__motors = None
+
+    def __save_big(self, num_of_images):
+        """
+        Write the dates and motor positions back in the 40 byte record layout,
+        entries of removed images are dropped
         """
-        return "NOT READY"
-        self.__dates = Big_obj("dates", values=self.__read_value("ImageInfo/Date", bytes))
-        self.__motors = Big_obj("motor", values=self.__read_value("PositionInfo/MotorPositions", float32),\
-                                        raw=self.__read_value("PositionInfo/RawMotorPositions", float32),\
-                                        ideal=self.__read_value("PositionInfo/MotorPositionsIdeal", float32),\
-                                        axis=self.__read_value("PositionInfo/AxisNames", bytes),\
-                                        units=self.__read_value("PositionInfo/AxisUnits", bytes))
+        if self.__dates is not None:
+            self.write_stream(self.__big_path["dates"],
+                              encode_dates(self.__dates[:num_of_images], self.__raw_dates))
+        if self.__motors is not None:
+            self.write_stream(self.__big_path["axis_names"], encode_names(self.__motors["axis_names"]))
+            self.write_stream(self.__big_path["units"], encode_names(self.__motors["units"]))
+            for key in ["motor", "motor_raw", "motor_ideal"]:
+                if self.__motors[key] is not None:
+                    self.write_stream(self.__big_path[key],
+                                      np.asarray(self.__motors[key], dtype=float32)[:num_of_images].tobytes())
 
     def __load_array_data(self):
         """
         Load all array data with the same size as num_of_images for saving later. JUST in write mode.
         """
         num_of_images = self.__meta["number_of_images"]
+        temp_paths = [p.lower() for entry in self.__schema.values() for p in entry["paths"]]
+        # Checksums to find unchanged images on save
+        self.__image_crc = {i+1: zlib.crc32(image) for i, image in enumerate(self.__images)}
 
         for s in self.__stream_list:
-            temp_paths = [p for l in self.__meta_path.values() for p in l]
+            if s.lower() in temp_paths or s.startswith("ImageData"):
+                continue
             try:
                 data_f = np.frombuffer(self.read_stream(s), dtype=float32)
-                if not s in temp_paths and data_f.size == num_of_images:
+                if data_f.size == num_of_images:
                     if np.std(data_f, ddof=1) > MAX_CONST_DEVIATION:
-                        self.__meta[f"array_{s.split('/')[-1]}"] = data_f
-                        self.__meta_path[f"array_{s.split('/')[-1]}"] = [s]
+                        name = f"array_{s.split('/')[-1]}"
+                        self.__meta[name] = data_f
+                        self.__meta_path[name] = [s]
+                        self.__schema[name] = {"paths": [s], "dtype": float32, "shape": "images", "unit": None}
                     else:
                         self.__const_array_data[s] = data_f
             except:
                 pass
     
 # PUBLIC
-    def add_meta(self, name, path, dtype=None, data=None, shape=None):
-        self.__meta_path[name] = [path]
-        if not data and not shape:
+    def add_meta(self, name, path, dtype=None, data=None, shape=None, unit=None):
+        """
+        Create a new meta entry, if dtype is not given it is taken from the schema or from data
+        """
+        known, entry = schema_for_path(path, self.__schema)
+        if dtype is None and entry is not None:
+            dtype = entry["dtype"]
+            unit = entry["unit"] if unit is None else unit
+        if dtype is None and data is None:
             raise ValueError("At least one of data and dtype has to be specified")
-        if not data:
+        if dtype is None:
+            dtype = bytes if isinstance(data, (bytes, str)) else np.asarray(data).dtype.type
+        if data is None:
             data = self.__read_value(path, dtype)
         if shape:
-            data = data.reshape(shape)
+            data = np.asarray(data).reshape(shape)
+        self.__meta_path[name] = [path]
+        self.__schema[name] = {"paths": [path], "dtype": dtype, "shape": shape or "scalar", "unit": unit}
         self.meta[name] = data
 
+    def get_unit(self, name):
+        """Returns the unit of a meta entry, None if unitless or unknown"""
+        if name == "angles":
+            return ANGLE_UNIT
+        return self.__schema.get(name, {}).get("unit")
+
+    def __projection_arrays(self):
+        """Returns the names of the meta entries with one value per projection"""
+        return [name for name in self.__meta if self.__schema.get(name, {}).get("shape") == "images"
+                and not self.__schema[name].get("const")]
+
+    def __edit_projections(self, edit):
+        """
+        Applies edit(array, name) to the images and every array with one entry per projection
+        """
+        if self.__lazy is not None:
+            raise MemoryError("The images are not loaded, projections can not be edited")
+        num_of_images = self.__images.shape[0]
+        for name in self.__projection_arrays():
+            value = np.asarray(self.__meta[name])
+            if value.shape[:1] == (num_of_images,):
+                self.__meta[name] = edit(value, name)
+        if self.__dates is not None and self.__dates.size == num_of_images:
+            self.__dates = edit(self.__dates, "dates")
+        if self.__motors is not None:
+            for key in ["motor", "motor_raw", "motor_ideal"]:
+                if self.__motors[key] is not None and len(self.__motors[key]) == num_of_images:
+                    self.__motors[key] = edit(np.asarray(self.__motors[key]), key)
+        self.__image_origin = edit(self.__image_origin, "origin")
+        self.__images = edit(self.__images, "images")
+        self.__angles = self.__meta["angles"]
+        self.__meta["number_of_images"] = self.__images.shape[0]
+
+    def insert_images(self, index, images, **values):
+        """
+        Inserts images before index. The values of the other per projection arrays are given as keywords
+        (angles=..., x_positions=..., array_ExpTimes=..., dates=..., motor=..., ...).
+        Missing ones are copied from the neighbouring projection
+        """
+        image_dtype = float32 if self.__meta["image_data_type"] == 10 else uint16
+        images = np.asarray(images, dtype=image_dtype)
+        if images.ndim == 2:
+            images = images[np.newaxis]
+        if images.shape[1:] != self.__images.shape[1:]:
+            raise ValueError(f"Images need the shape {self.__images.shape[1:]}")
+        num_of_images = self.__images.shape[0]
+        index = int(np.clip(index if index >= 0 else num_of_images + index, 0, num_of_images))
+        neighbour = max(index-1, 0)
+        count = images.shape[0]
+        new = dict(values, images=images, origin=np.zeros(count, dtype=int))
+        unknown = set(values) - set(self.__projection_arrays()) - {"dates", "motor", "motor_raw", "motor_ideal"}
+        if unknown:
+            raise KeyError(f"No per projection arrays: {', '.join(sorted(unknown))}")
+
+        def edit(value, name):
+            if name in new:
+                insert = np.asarray(new[name], dtype=value.dtype).reshape(count, *value.shape[1:])
+            else:
+                insert = np.repeat(value[neighbour:neighbour+1], count, axis=0)
+            return np.concatenate([value[:index], insert, value[index:]])
+        self.__edit_projections(edit)
+
+    def append_images(self, images, **values):
+        """
+        Appends images at the end, see insert_images for the values of the other per projection arrays
+        """
+        self.insert_images(self.__images.shape[0], images, **values)
+
+    def delete_images(self, indices):
+        """
+        Deletes the images at indices together with their entries of all per projection arrays
+        """
+        keep = np.delete(np.arange(self.__images.shape[0]), indices)
+        self.__edit_projections(lambda value, name: value[keep])
+
+    def reorder_images(self, order):
+        """
+        Reorders the images and all per projection arrays, order is an index array
+        (may also drop or repeat projections)
+        """
+        order = np.asarray(order, dtype=int)
+        self.__edit_projections(lambda value, name: value[order])
+
+    def sort_by_angle(self):
+        """
+        Sorts the projections by their angle, returns the used order
+        """
+        order = np.argsort(self.__angles, kind="stable")
+        self.reorder_images(order)
+        return order
+
     def normalize_images(self):
+        if self.__lazy is not None:
+            raise MemoryError("The images are not loaded, read them with TXRM_array(normalize=True)")
         self.__images = self.__images/self.__reference
     
     def reset(self):
@@ -506,18 +1996,27 @@ class TXRM_IO(OLE_Base):
         self.__angles = deepcopy(self.__meta["angles"])
         self.__const_array_data = deepcopy(self.__default["const"])
         self.__meta_path = deepcopy(self.__default["meta_path"])
+        self.__schema = deepcopy(self.__default["schema"])
+
+    def close(self):
+        if self.__lazy is not None:
+            self.__lazy.close()
+            self.__lazy = None
+        super().close()
 
     def open(self):
         if self.__mode == "w" and not self.__overwrite:
             old = self.__source_file
-            file_path = f"{self.__source_file.removesuffix('.txrm')}_edit.txrm"
+            base, suffix = os.path.splitext(self.__source_file)
+            file_path = f"{base}_edit{suffix}"
             shutil.copy(old, file_path)
             self.__source_file = file_path
+        if not os.path.exists(self.__source_file):
+            raise FileNotFoundError(self.__source_file)
         # Open File
-        modus = STGM_READWRITE|STGM_SHARE_EXCLUSIVE
-        self.ifile = pythoncom.StgOpenStorageEx(self.__source_file, modus, STGFMT_STORAGE, 0,
-                                                pythoncom.IID_IStorage)
-        self.__stream_list = sorted(self._build_streams())
+        self.file_path = self.__source_file
+        super().open()
+        self.__stream_list = OLE_Base.streams.fget(self)
         
         if MAKE_BACKUP:
             # Make dict of defaults
@@ -526,18 +2025,17 @@ class TXRM_IO(OLE_Base):
                 "reference": deepcopy(self.__reference),
                 "meta": deepcopy(self.__meta),
                 "const": deepcopy(self.__const_array_data),
-                "meta_path": deepcopy(self.__meta_path)
+                "meta_path": deepcopy(self.__meta_path),
+                "schema": deepcopy(self.__schema)
             }
 
 
     def save(self):
-        mode=STGM_READWRITE|STGM_SHARE_EXCLUSIVE
         data_failure = False
         if self.__mode != "w":
             raise IOError("File can not be saved in read mode!")
         else:
             num_of_images = self.__images.shape[0]
-            num_of_image_storages = int(np.ceil(num_of_images/100))
 
             for key, value in self.__meta.items():
                 if (key.startswith("array_") or key in ["angles", "x_positions", "y_positions",
@@ -545,46 +2043,193 @@ class TXRM_IO(OLE_Base):
                 ) and value.size<num_of_images:
                     print(key, "does not have the right length of", num_of_images, "is", value.size, flush=True)
                     data_failure = True
+            if self.__dates is not None and self.__dates.size < num_of_images:
+                print("dates does not have the right length of", num_of_images, "is", self.__dates.size, flush=True)
+                data_failure = True
+            if self.__motors is not None:
+                for key in ["motor", "motor_raw", "motor_ideal"]:
+                    if self.__motors[key] is not None and len(self.__motors[key]) < num_of_images:
+                        print(key, "does not have the right length of", num_of_images, "is", len(self.__motors[key]), flush=True)
+                        data_failure = True
                 # NOTE: Change maybe to add all the print lines to the ValueError?
             if data_failure:
                 raise ValueError("Some Arrays have not the right length!")
         
         print("Saving file, please wait | ", end="", flush=True)
-        # First remove all image storages not needed and also the last filled one to remove images
-        for i in range(num_of_image_storages, num_of_image_storages+10):
-            if self.exists(f"ImageData{i}"):
-                self.remove_stream(f"ImageData{i}")
+        plan = self.__plan_images(num_of_images)
+        journal = {
+            "images": num_of_images,
+            "move": [[f"ImageData{(s+99)//100}/Image{s}", f"ImageData{(t+99)//100}/Image{t}"]
+                     for s, t in plan["moves"]],
+            "write": [f"ImageData{(t+99)//100}/Image{t}" for t in plan["writes"]],
+            "remove": [f"ImageData{(j+99)//100}/Image{j}" for j in sorted(plan["existing"]) if j > num_of_images]
+                      + plan["leftover"],
+            "meta": [path for paths in self.__meta_path.values() for path in paths] +
+                    list(self.__const_array_data) + list(self.__big_path.values()),
+        }
+        # A failed transacted save is reverted, so the image layout of the file stays as well
+        state = (self.__image_origin.copy(), dict(self.__image_crc), list(self.__stream_list))
+        try:
+            with self.transaction(journal):
+                with _phase("image_write"):
+                    self.__save_images(num_of_images, plan)
+                with _phase("meta_write"):
+                    self.__save_meta(num_of_images)
+        except BaseException:
+            if self.transacted:
+                self.__image_origin, self.__image_crc, self.__stream_list[:] = state
             else:
-                # There should not be empty spaces between
-                break
+                # Images may already be moved or rewritten, the next save writes all of them
+                self.__image_origin = np.zeros(num_of_images, dtype=int)
+                self.__image_crc = dict()
+                self.__stream_list[:] = sorted(self._build_streams())
+            raise
+        print("Ready")
 
-        # Save images ##################################################################
-        current_image_index = 1
-        for i in range(1, num_of_image_storages+1):
-            # Create image storage or open one
-            if self.exists(f"ImageData{i}"):
-                istorage = self.ifile.OpenStorage(f"ImageData{i}", None, mode, None)
+    def __plan_images(self, num_of_images):
+        """
+        Plans which stored images can stay or be moved, a stored image can just be used once.
+        The rest is written
+        """
+        existing = set()
+        # Temporary names of moves left by a failed direct save
+        leftover = []
+        for s in self.__stream_list:
+            storage, _, name = s.partition("/")
+            if storage.startswith("ImageData") and name.startswith("Image") and name[5:].isdigit():
+                existing.add(int(name[5:]))
+            elif storage.startswith("ImageData") and name.startswith("_Image") and name[6:].isdigit():
+                leftover.append(s)
+
+        # Just images which may still be the stored ones need a checksum (in place edits),
+        # new and replaced ones (origin 0) are written anyway
+        candidates = [k for k in range(num_of_images) if self.__image_origin[k] in existing]
+        with ThreadPoolExecutor(max_workers=self.__save_workers()) as pool:
+            # crc32 releases the GIL
+            crcs = dict(zip(candidates, pool.map(lambda k: zlib.crc32(self.__images[k]), candidates)))
+        used = set()
+        moves = []
+        writes = []
+        for k in range(num_of_images):
+            target, source = k+1, int(self.__image_origin[k])
+            if source in existing and source not in used and self.__image_crc.get(source) == crcs[k] \
+                    and self.__same_as_stored(k, source):
+                used.add(source)
+                if source != target:
+                    moves.append((source, target))
             else:
-                istorage = self.ifile.CreateStorage(f"ImageData{i}", mode, 0)
-            
-            # Save 100 images per storage
-            for _ in range(100):
-                if current_image_index>num_of_images:
-                    break
-                if self.exists(f"ImageData{i}/Image{current_image_index}"):
-                    istream = istorage.OpenStream(f"Image{current_image_index}", None, mode, 0)
-                else:
-                    istream = istorage.CreateStream(f"Image{current_image_index}", mode, 0)
-                istream.Write(self.__images[current_image_index-1].tobytes())
-                current_image_index += 1
+                writes.append(target)
+        return {"crcs": crcs, "moves": moves, "writes": writes, "existing": existing, "leftover": leftover}
+
+    def __same_as_stored(self, k, source):
+        """Confirms a checksum match: image k has the bytes of the stored image source"""
+        stored = self.read_stream(f"ImageData{(source+99)//100}/Image{source}")
+        image = np.ascontiguousarray(self.__images[k])
+        return len(stored) == image.nbytes and np.array_equal(np.frombuffer(stored, dtype=np.uint8),
+                                                               image.view(np.uint8).ravel())
+
+    def __save_workers(self):
+        return max(1, min(SAVE_WORKERS or os.cpu_count() or 1, SAVE_PIPELINE_DEPTH))
+
+    def __save_images(self, num_of_images, plan):
+        """
+        Write the images, 100 images per ImageData storage.
+        Only changed storages are touched: unchanged images stay, moved ones are renamed
+        and just new or edited images are written
+        """
+        mode=STGM_READWRITE|STGM_SHARE_EXCLUSIVE
+        streams = self.__stream_list
+        moves, writes = plan["moves"], plan["writes"]
+        # Checksums of the kept images (by target), written ones are added below
+        crcs = {k+1: crc for k, crc in plan["crcs"].items()}
+        existing = set(plan["existing"])
+        old_storages = max([(j+99)//100 for j in existing], default=0)
+
+        istorages = dict()
+        def storage(i):
+            if i not in istorages:
+                _count("storage_open")
+                try:
+                    istorages[i] = self.ifile.OpenStorage(f"ImageData{i}", None, mode, None)
+                except:
+                    istorages[i] = self.ifile.CreateStorage(f"ImageData{i}", mode, 0)
+            return istorages[i]
+
+        for path in plan["leftover"]:
+            storage_name, _, name = path.partition("/")
+            storage(int(storage_name[9:])).DestroyElement(name)
+        # Move to temporary names first, targets may still be occupied
+        for source, target in moves:
+            src, dst = (source+99)//100, (target+99)//100
+            _count("image_move")
+            if src == dst:
+                storage(src).RenameElement(f"Image{source}", f"_Image{target}")
+            else:
+                storage(src).MoveElementTo(f"Image{source}", storage(dst), f"_Image{target}", STGMOVE_MOVE)
+            existing.discard(source)
+        # Remove the images not needed anymore
+        for j in sorted(existing):
+            if j > num_of_images:
+                _count("image_remove")
+                storage((j+99)//100).DestroyElement(f"Image{j}")
+                existing.discard(j)
+        for source, target in moves:
+            istorage = storage((target+99)//100)
+            if target in existing:
+                istorage.DestroyElement(f"Image{target}")
+            istorage.RenameElement(f"_Image{target}", f"Image{target}")
+            existing.add(target)
+        # Write new and edited images: workers prepare the bytes of the next images
+        # while this thread writes them in order, all storage calls stay in this thread
+        image_dtype = np.dtype(float32 if self.__meta["image_data_type"] == 10 else uint16).newbyteorder("<")
+        def write(target, data):
+            istorage = storage((target+99)//100)
+            if target in existing:
+                istream = istorage.OpenStream(f"Image{target}", None, mode, 0)
+            else:
+                istream = istorage.CreateStream(f"Image{target}", mode, 0)
+            istream.SetSize(len(data))
+            crcs[target] = zlib.crc32(data)
+            if PROFILER is None:
+                istream.Write(data)
+            else:
+                PROFILER.call("image_write", istream.Write, data)
+            existing.add(target)
 
-        # Edit image infos #############################################################
+        with ThreadPoolExecutor(max_workers=self.__save_workers()) as pool:
+            pending = deque()
+            for target in writes:
+                pending.append((target, pool.submit(_prepare_image, self.__images[target-1], image_dtype)))
+                if len(pending) >= SAVE_PIPELINE_DEPTH:
+                    target, future = pending.popleft()
+                    write(target, future.result())
+            while pending:
+                target, future = pending.popleft()
+                write(target, future.result())
+        # Remove storages which are empty now
+        istorages.clear()
+        for i in range((num_of_images+99)//100+1, old_storages+1):
+            try:
+                self.ifile.DestroyElement(f"ImageData{i}")
+            except:
+                pass
+
+        streams[:] = sorted([s for s in streams if not s.startswith("ImageData")] +
+                            [f"ImageData{(k+99)//100}/Image{k}" for k in range(1, num_of_images+1)])
+        self.__image_origin = np.arange(1, num_of_images+1)
+        self.__image_crc = {k: crcs[k] for k in range(1, num_of_images+1)}
+
+    def __save_meta(self, num_of_images):
+        """
+        Write the meta data, the constant arrays and the big records
+        """
         # NOTE: TESTED, SLOW
-        if ANGLE_UNIT=="rad":
-            self.__meta["angles"] = np.degrees(self.__meta["angles"])
         for key, path_list in self.__meta_path.items():
+            value = self.__meta[key]
+            if key == "angles" and ANGLE_UNIT=="rad":
+                value = np.degrees(value)
+            data = encode_meta(value, self.__schema[key])
             for path in path_list:
-                data = np.array(self.__meta[key]).tobytes()
                 print("Saving:", path)
                 self.write_stream(path, data)
         
@@ -595,13 +2240,13 @@ class TXRM_IO(OLE_Base):
                 data = value[:num_of_images].tobytes()
             print("Saving",key)
             self.write_stream(key, data)
-        print("Ready")
+        self.__save_big(num_of_images)
 
     def save_as(self, file_name):
         if self.__mode == "r":
             raise IOError("File can not be saved in read mode!")
-        if not file_name.lower().endswith(".txrm"):
-            file_name = f"{file_name}.txrm"
+        if not file_name.lower().endswith((".txrm", ".txm")):
+            file_name = f"{file_name}{os.path.splitext(self.__source_file)[1]}"
         if not ("\\" in file_name or "/" in file_name):
             file_path = os.path.join(os.path.dirname(self.__source_file), file_name)
         else:
@@ -610,17 +2255,22 @@ class TXRM_IO(OLE_Base):
                 file_path = os.path.join(os.path.dirname(self.__source_file), os.path.basename(file_name))
             else:
                 file_path = file_name
+        self.close()
         shutil.copy(self.__source_file, file_path)
         # Open File
-        modus = STGM_READWRITE|STGM_SHARE_EXCLUSIVE
-        self.ifile = pythoncom.StgOpenStorageEx(file_path, modus, STGFMT_STORAGE, 0,
-                                                pythoncom.IID_IStorage)
-        tmp_streams = self.__stream_list
-        self.__stream_list = sorted(self.__build_streams())
-        self.save()
-        self.__stream_list = tmp_streams
-        self.ifile = pythoncom.StgOpenStorageEx(self.__source_file, modus, STGFMT_STORAGE, 0,
-                                                pythoncom.IID_IStorage)
+        self.file_path = file_path
+        super().open()
+        self.__stream_list = OLE_Base.streams.fget(self)
+        # The source file keeps its image layout
+        image_state = (self.__image_origin.copy(), dict(self.__image_crc))
+        try:
+            self.save()
+        finally:
+            self.__image_origin, self.__image_crc = image_state
+            self.close()
+            self.file_path = self.__source_file
+            super().open()
+            self.__stream_list = OLE_Base.streams.fget(self)
 
 
 # PROPERTIES
@@ -641,6 +2291,13 @@ class TXRM_IO(OLE_Base):
         self.meta["angles"] = value
         self.__angles = value
 
+    @property
+    def angle_index(self):
+        """Angle_Index of the angles, it is built again when the angles changed"""
+        if self.__angle_index is None or not np.array_equal(self.__angle_index.angles, self.__angles):
+            self.__angle_index = Angle_Index(self.__angles)
+        return self.__angle_index
+
     @property
     def meta(self):
         return self.__meta
@@ -650,17 +2307,34 @@ class TXRM_IO(OLE_Base):
             raise ValueError("Use add_meta to add meta-data to the object!")
         self.__meta = value
         self.angles = self.__meta["angles"]
-        self.__meta["number_of_images"] = self.__images.shape[0]
+        self.__meta["number_of_images"] = len(self.images)
 
     @property
     def images(self):
-        return self.__images
+        """The images, a lazy TXRM_array if they did not fit into the memory budget (see memory_plan), it is closed with the file"""
+        return self.__images if self.__lazy is None else self.__lazy
     @images.setter
     def images(self, value):
+        if self.__lazy is not None:
+            self.__lazy.close()
+            self.__lazy = None
         image_dtype = float32 if self.__meta["image_data_type"] == 10 else uint16
-        self.__images = value.astype(image_dtype)
+        old, self.__images = self.__images, value.astype(image_dtype)
         self.__meta["number_of_images"] = self.__images.shape[0]
+        # Images on the same position keep their stored image if they did not change,
+        # replaced ones are written without a checksum
+        origin = np.zeros(self.__images.shape[0], dtype=int)
+        keep = min(origin.size, self.__image_origin.size)
+        if old is not None and old.shape[1:] == self.__images.shape[1:]:
+            same = [k for k in range(keep) if np.array_equal(old[k], self.__images[k])]
+            origin[same] = self.__image_origin[same]
+        self.__image_origin = origin
     
+    @property
+    def memory_plan(self):
+        """Chosen strategy and projected peak of the memory budget (see plan_memory), None without budget"""
+        return self.__memory_plan
+
     @property
     def distances(self):
         """
@@ -680,25 +2354,42 @@ class TXRM_IO(OLE_Base):
     @property
     def streams(self):
         return self.__stream_list
+
+    @property
+    def schema(self):
+        """
+        Returns the schema (name: paths, dtype, shape, unit) of the meta data of this file
+        """
+        return self.__schema
     
     @property
     def dates(self):
         """
-        Returns the dates for each projection
+        Returns the dates for each projection as datetime64[ms]
         """
-        return self.__dates.get_values()
+        return self.__dates
     @dates.setter
     def dates(self, data):
-        self.__dates.setter(data)
+        self.__dates = np.asarray(data)
     
     @property
     def motors(self):
         """
         Return the Motorspostionarrays as a tuple of (axis_names, units, motors, raw_motors, ideal_motors)
+        The motor arrays have the shape (number_of_images, axes)
         """
-        return self.__motors.get_values()
+        if self.__motors is None:
+            return None
+        return (self.__motors["axis_names"], self.__motors["units"], self.__motors["motor"],
+                self.__motors["motor_raw"], self.__motors["motor_ideal"])
     @motors.setter
     def motors(self, data):
-        self.__motors.setter(data)
+        axis_names, units, motor, motor_raw, motor_ideal = data
+        axis_names = np.asarray(axis_names)
+        for values in [motor, motor_raw, motor_ideal]:
+            if values is not None and np.shape(values)[-1] != axis_names.size:
+                raise ValueError("Motor arrays need one column per axis name")
+        self.__motors = dict(axis_names=axis_names, units=np.asarray(units), motor=motor,
+                             motor_raw=motor_raw, motor_ideal=motor_ideal)
 
 
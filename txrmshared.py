@@ -0,0 +1,154 @@
+######################################################################################
+#  ______________   ___      ___   ______      ____        ____    __     _______    #
+# |_____    _____|  \  \    /  /  |  | \  \   |    \      /    |  |  |  /   ___   \  #
+#       |  |         \  \  /  /   |  |  |  |  |     \    /     |  |  |  |  |   |  |  #
+#       |  |          \  `´  /    |  | /  /   |  |\  \  /  /|  |  |  |  |  |   |  |  #
+#       |  |          /  /\  \    |  |\  \    |  | \  \/  / |  |  |  |  |  |   |  |  #
+#  _    |  |         /  /  \  \   |  | \  \   |  |  \ __ /  |  |  |  |  |  |___|  |  #
+# |_|   |__|        /__/    \__\  |__|  \__\  |__|          |__|  |__|  \ _______ /  #
+#                                                                                    #
+######################################################################################
+# This software was created by Mario Krake for ISEA at RWTH.                         #
+#                                                                                    #
+# Use at your own risk. Mario Krake and RWTH are not responsible for any kind of     #
+# damage including hardware and software, data loss, profit loss, or any other kind. #
+# By using the software you agree to the terms and conditions.                       #
+#                                                                                    #
+# Monetized and/or uncredited distribution is strongly prohibited.                   #
+######################################################################################
+
+import os
+import mmap
+import atexit
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import txrmio2
+
+
+# Shared memory which can not be closed yet as views of it are alive
+_unclosed = []
+
+def _close(shm=None):
+    """Closes shared memory, it is tried again on the next call while views of it are alive"""
+    if shm is not None:
+        _unclosed.append(shm)
+    for s in list(_unclosed):
+        try:
+            s.close()
+            _unclosed.remove(s)
+        except BufferError:
+            pass
+
+atexit.register(_close)
+
+def _open_shared_memory(name):
+    """Attaches to existing shared memory, the creating process stays responsible for unlinking it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before python 3.13, the workers of multiprocessing share the tracker of the creating process
+        return shared_memory.SharedMemory(name=name)
+
+class Shared_Stack:
+    """
+    Reads the projections of a file once and shares them with other processes, e.g. multiprocessing workers.
+    mode "shm":  The images are copied into named shared memory (also normalized or shifted images).
+    mode "mmap": Every process maps the file readonly, nothing is copied. This needs evenly spaced images
+                 in the file (see TXRM_array.layout), otherwise shared memory is used.
+    Pass descriptor (a small picklable dict, also with the meta data and angles) to the workers,
+    they get the images with attach(descriptor). close (or the end of the with block) frees the shared memory
+    """
+    def __init__(self, file_path, mode="shm", normalize=False, apply_shifts=False, workers=None, chunk=32):
+        if mode not in ("shm", "mmap"):
+            raise ValueError("mode has to be 'shm' or 'mmap'")
+        self.file_path = file_path
+        self.shm = None
+        self.images = None
+        self.__view = None
+        meta = txrmio2.read_meta(file_path)
+        native = True if mode == "mmap" else None
+        with txrmio2.TXRM_array(file_path, normalize, apply_shifts, workers, native) as arr:
+            shape = arr.shape()
+            dtype = np.dtype(np.float32 if normalize else arr.img_dtype)
+            angles = np.array(arr.angles)
+            layout = arr.layout() if mode == "mmap" and not normalize and not apply_shifts else None
+            if layout is not None:
+                self.descriptor = {"kind": "mmap", "file": os.path.abspath(file_path),
+                                   "offset": layout[0], "step": layout[1]}
+            else:
+                nbytes = int(np.prod(shape))*dtype.itemsize
+                self.shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+                try:
+                    self.images = np.frombuffer(self.shm.buf, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+                    for idx, images in arr.iter_chunks(chunk):
+                        self.images[idx] = images
+                except:
+                    self.close()
+                    raise
+                self.descriptor = {"kind": "shm", "name": self.shm.name}
+        self.descriptor.update(shape=shape, dtype=dtype.str, meta=meta, angles=angles)
+        if layout is not None:
+            self.__view = attach(self.descriptor)
+            self.images = self.__view.images
+
+    def __enter__(self):  # Neccessary for contextmanager
+        return self
+
+    def __exit__(self, type, value, traceback):  # Neccessary for contextmanager
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """Frees the shared memory, attached workers keep their views until they close them"""
+        self.images = None
+        if self.__view is not None:
+            self.__view.close()
+            self.__view = None
+        if self.shm is not None:
+            # The name is removed at once, the memory is freed with the last view
+            self.shm.unlink()
+            _close(self.shm)
+            self.shm = None
+
+
+class Shared_View:
+    """The images (readonly), meta and angles of a Shared_Stack in another process, see attach"""
+    def __init__(self, descriptor):
+        self.meta = descriptor["meta"]
+        self.angles = descriptor["angles"]
+        self.__shm = None
+        shape, dtype = tuple(descriptor["shape"]), np.dtype(descriptor["dtype"])
+        if descriptor["kind"] == "shm":
+            self.__shm = _open_shared_memory(descriptor["name"])
+            images = np.frombuffer(self.__shm.buf, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+        else:
+            with open(descriptor["file"], "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            step, nbytes = descriptor["step"], int(np.prod(shape[1:]))*dtype.itemsize
+            # frombuffer holds the map as long as the images are alive
+            flat = np.frombuffer(data, dtype=dtype, offset=descriptor["offset"],
+                                 count=(step*(shape[0]-1)+nbytes)//dtype.itemsize)
+            images = np.lib.stride_tricks.as_strided(flat, shape=shape,
+                                                     strides=(step, shape[2]*dtype.itemsize, dtype.itemsize))
+        images.flags.writeable = False
+        self.images = images
+
+    def __enter__(self):  # Neccessary for contextmanager
+        return self
+
+    def __exit__(self, type, value, traceback):  # Neccessary for contextmanager
+        self.close()
+
+    def close(self):
+        self.images = None
+        if self.__shm is not None:
+            _close(self.__shm)
+            self.__shm = None
+
+def attach(descriptor):
+    """Returns the Shared_View of the descriptor of a Shared_Stack, use it as context manager"""
+    return Shared_View(descriptor)